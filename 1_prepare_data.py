@@ -1,10 +1,20 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import faiss
-import pickle
-import logging
-import sys
+from models import get_encoder
+from encoding_pool import EncodingPool
+from embedding_backends import BACKENDS, cache_id
+from metastore import ColumnarWriter, swap_dir
+from catalog import atomic_write
+from indexing import build_index, benchmark_index
+from config import (EMBED_MODEL, EMBED_BACKEND, INDEX_TYPE, INDEX_STORAGE, INDEX_PARAMS,
+                    INDEX_BENCH_QUERIES)
 
 # Configure logging
 tlogging = logging.getLogger()
@@ -16,57 +26,159 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Streaming build: CSV chunks are encoded batch by batch and appended to
+# on-disk vectors + columnar metadata, with a checkpoint every few chunks.
+# Re-running after a crash resumes from the last checkpoint.
+CHECKPOINT_DIR = "build_checkpoint"
+STATE_FILE     = os.path.join(CHECKPOINT_DIR, "state.json")
+VECTORS_FILE   = os.path.join(CHECKPOINT_DIR, "vectors.f32")
+META_BUILD_DIR = os.path.join(CHECKPOINT_DIR, "metadata")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the FAISS index and metadata store")
+    parser.add_argument("--csv", default=os.path.join("dataset", "Kaggle_7k_books", "books.csv"))
+    parser.add_argument("--index-out", default="book_index.faiss")
+    parser.add_argument("--meta-out", default="books_metadata")
+    parser.add_argument("--chunk-rows", type=int, default=10_000,
+                        help="CSV rows read per chunk")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="texts per model forward pass")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="encoding processes (CPU); 1 encodes in-process")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="torch threads per worker (default: cores / workers)")
+    parser.add_argument("--backend", default=EMBED_BACKEND, choices=BACKENDS,
+                        help="embedding backend (see embedding_backends.py)")
+    parser.add_argument("--checkpoint-every", type=int, default=1,
+                        help="chunks between checkpoints")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore any checkpoint and build from scratch")
+    return parser.parse_args()
+
+
+def source_fingerprint(path):
+    st = os.stat(path)
+    return {"csv": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime}
+
+
+def load_state(args):
+    """Checkpoint state for this CSV, or None to start fresh."""
+    if args.restart or not os.path.exists(STATE_FILE):
+        return None
+    with open(STATE_FILE, "r") as f:
+        state = json.load(f)
+    if state["source"] != source_fingerprint(args.csv):
+        logger.warning("CSV changed since the checkpoint was written; starting over")
+        return None
+    if state.get("embedding", EMBED_MODEL) != cache_id(EMBED_MODEL, args.backend):
+        logger.warning("Checkpoint was encoded with another embedding backend; starting over")
+        return None
+    return state
+
+
+def save_state(state):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+    atomic_write(STATE_FILE, write)
+
 
 def main():
+    args = parse_args()
     try:
-        # 1. Load CSV
-        logger.debug("Loading CSV file: books.csv")
-        df = pd.read_csv(r"dataset\Kaggle_7k_books\books.csv")
-        logger.info(f"Loaded {len(df)} rows from CSV")
-
-        # 2. Drop rows without description
-        before_drop = len(df)
-        df = df.dropna(subset=["description"])
-        after_drop = len(df)
-        logger.info(f"Dropped {before_drop - after_drop} rows without description; {after_drop} remain")
-
-        # 3. Build text corpus for embeddings
-        logger.debug("Building text corpus from title and description")
-        texts = (df["title"].fillna("") + ". " + df["description"]).tolist()
-        logger.info(f"Prepared {len(texts)} text entries for embedding")
-
-        # 4. Load embedding model
-        logger.debug("Loading embedding model: all-MiniLM-L6-v2")
-        model = SentenceTransformer("all-MiniLM-L6-v2")
-
-        # 5. Compute embeddings
-        logger.info("Starting embedding computation...")
-        embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
-        logger.info(f"Computed embeddings with shape {embeddings.shape}")
-
-        # 6. Normalize embeddings for cosine similarity
-        logger.debug("Normalizing embeddings")
-        norms = np.linalg.norm(embeddings, axis=1)
-        if np.any(norms == 0):
-            logger.warning("Found zero-vector embedding(s), adding epsilon to avoid division by zero")
-            norms[norms == 0] = 1e-6
-        embeddings = embeddings / norms[:, np.newaxis]
-        logger.info("Normalization complete")
-
-        # 7. Build Faiss index
-        dim = embeddings.shape[1]
-        logger.debug(f"Creating Faiss index with dimension: {dim}")
-        index = faiss.IndexFlatIP(dim)
-        logger.debug("Adding embeddings to Faiss index")
-        index.add(embeddings.astype('float32'))
+        # 1. Resume from checkpoint or start fresh
+        state = load_state(args)
+        if state is None:
+            shutil.rmtree(CHECKPOINT_DIR, ignore_errors=True)
+            os.makedirs(CHECKPOINT_DIR)
+            state = {"source": source_fingerprint(args.csv),
+                     "embedding": cache_id(EMBED_MODEL, args.backend),
+                     "csv_rows": 0, "kept": 0, "columns": None, "dim": None}
+        else:
+            logger.info(f"Resuming after {state['csv_rows']} CSV rows "
+                        f"({state['kept']} books already encoded)")
+
+        # 2. Load embedding model (in-process, or one copy per worker)
+        logger.debug(f"Loading embedding model: {EMBED_MODEL} ({args.backend} backend)")
+        encoder = get_encoder(EMBED_MODEL, backend=args.backend)
+        dim = state["dim"] = encoder.dim
+        pool = None
+        if args.workers > 1:
+            pool = EncodingPool(EMBED_MODEL, args.workers, args.batch_size, args.torch_threads,
+                                args.backend)
+            logger.info(f"Encoding with {args.workers} worker processes")
+
+        # Drop anything written after the last checkpoint
+        with open(VECTORS_FILE, "ab") as vec_f:
+            vec_f.truncate(state["kept"] * dim * 4)
+        writer = None
+        if state["columns"]:
+            writer = ColumnarWriter(META_BUILD_DIR, state["columns"], resume_rows=state["kept"])
+
+        # 3. Stream CSV chunks: drop rows without description, encode, append
+        logger.debug(f"Streaming CSV file: {args.csv}")
+        reader = pd.read_csv(args.csv, chunksize=args.chunk_rows,
+                             skiprows=range(1, state["csv_rows"] + 1))
+        with open(VECTORS_FILE, "ab") as vec_f:
+            for n_chunk, chunk in enumerate(reader, start=1):
+                raw_rows = len(chunk)
+                chunk = chunk.dropna(subset=["description"]).drop(columns=["book_id"], errors="ignore")
+                # Positions among kept rows double as book ids
+                chunk.insert(0, "book_id", range(state["kept"], state["kept"] + len(chunk)))
+                if writer is None:
+                    state["columns"] = list(chunk.columns)
+                    writer = ColumnarWriter(META_BUILD_DIR, state["columns"])
+
+                texts = (chunk["title"].fillna("").astype(str) + ". "
+                         + chunk["description"].astype(str)).tolist()
+                if texts:
+                    embs = pool.encode(texts) if pool else \
+                           encoder.encode(texts, batch_size=args.batch_size)
+                    vec_f.write(embs.astype(np.float32).tobytes())
+                writer.append(chunk.to_dict(orient="records"))
+
+                state["csv_rows"] += raw_rows
+                state["kept"]     += len(chunk)
+                logger.info(f"Encoded {state['kept']} books ({state['csv_rows']} CSV rows read)")
+
+                # 4. Checkpoint: data first, then the state that points at it
+                if n_chunk % args.checkpoint_every == 0:
+                    vec_f.flush()
+                    os.fsync(vec_f.fileno())
+                    writer.flush()
+                    save_state(state)
+            vec_f.flush()
+            os.fsync(vec_f.fileno())
+        if pool is not None:
+            logger.info(f"Encoding throughput: {pool.throughput:.0f} texts/s")
+            pool.close()
+        if writer is not None:
+            writer.flush()
+        save_state(state)
+
+        # 5. Build Faiss index from the memory-mapped vectors (type/storage from config)
+        n = state["kept"]
+        embeddings = np.memmap(VECTORS_FILE, dtype=np.float32, mode="r", shape=(n, dim)) \
+                     if n else np.zeros((0, dim), dtype=np.float32)
+        ids = np.arange(n, dtype=np.int64)
+        logger.debug(f"Creating {INDEX_TYPE}/{INDEX_STORAGE} Faiss index with dimension: {dim}")
+        index = build_index(dim, embeddings, ids, INDEX_TYPE, INDEX_STORAGE, INDEX_PARAMS)
         logger.info(f"Faiss index has {index.ntotal} vectors")
+        if INDEX_BENCH_QUERIES:
+            report = benchmark_index(index, embeddings, ids, n_queries=INDEX_BENCH_QUERIES)
+            logger.info(f"Index quality vs exact search: {report}")
 
-        # 8. Save index and metadata
-        logger.debug("Saving Faiss index to book_index.faiss")
-        faiss.write_index(index, "book_index.faiss")
-        logger.debug("Saving metadata to books_metadata.pkl")
-        with open("books_metadata.pkl", "wb") as f:
-            pickle.dump(df.to_dict(orient="records"), f)
+        # 6. Save index and metadata, then drop the checkpoint
+        logger.debug(f"Saving Faiss index to {args.index_out}")
+        atomic_write(args.index_out, lambda p: faiss.write_index(index, p))
+        logger.debug(f"Saving columnar metadata to {args.meta_out}/")
+        if writer is None:
+            writer = ColumnarWriter(META_BUILD_DIR, ["book_id"])
+        writer.close()
+        swap_dir(META_BUILD_DIR, args.meta_out)
+        del embeddings
+        shutil.rmtree(CHECKPOINT_DIR, ignore_errors=True)
         logger.info("Data preparation complete: index and metadata saved")
 
     except Exception as e:
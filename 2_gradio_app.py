@@ -1,12 +1,11 @@
 import os
 import re
 import requests
-import pickle
 import faiss
-import numpy as np
 import torch
 import gradio as gr
-from sentence_transformers import SentenceTransformer
+from models import get_encoder
+from metastore import load_metadata
 
 # === Configuration ===
 with open("API.txt", "r") as f:
@@ -46,15 +45,12 @@ class BookRecommender:
     def __init__(self, index_path, metadata_path, api_key):
         # load FAISS index & metadata
         self.index = faiss.read_index(index_path)
-        with open(metadata_path, "rb") as f:
-            self.metadata = pickle.load(f)
-        self.model = SentenceTransformer("all-MiniLM-L6-v2", device=DEVICE)
+        self.metadata = load_metadata(metadata_path, "books_metadata.pkl")
+        self.model = get_encoder("all-MiniLM-L6-v2", device=DEVICE)
         self.api_key = api_key
 
     def embed(self, texts):
-        embs = self.model.encode(texts, convert_to_numpy=True)
-        norms = np.linalg.norm(embs, axis=1, keepdims=True)
-        return (embs / np.clip(norms, 1e-8, None)).astype(np.float32)
+        return self.model.encode(texts)
 
     def sanitize(self, raw, source):
         authors = raw.get("authors")
@@ -196,7 +192,7 @@ class BookRecommender:
         return html
 
 # === Initialize & UI ===
-recommender = BookRecommender("book_index.faiss", "books_metadata.pkl", GOOGLE_API_KEY)
+recommender = BookRecommender("book_index.faiss", "books_metadata", GOOGLE_API_KEY)
 
 with gr.Blocks() as app:
     gr.Markdown("# 📚 Book Recommendation System")
@@ -0,0 +1,133 @@
+# api_cache.py
+
+"""
+ResponseCache:
+- Persistent SQLite cache for Google Books API responses
+- Keyed by (q, langRestrict, startIndex, maxResults)
+- Fresh entries served directly; stale entries served while a background
+  refresh runs; expired entries fetched synchronously
+- Size-bounded (least recently used entries are evicted) with hit-rate stats
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """TTL + stale-while-revalidate cache of JSON bodies."""
+
+    EVICT_EVERY = 64    # puts between size checks
+
+    def __init__(self, path: str, ttl: float, stale_ttl: float, max_entries: int):
+        self.ttl         = ttl
+        self.stale_ttl   = stale_ttl
+        self.max_entries = max_entries
+        self.hits        = 0
+        self.stale_hits  = 0
+        self.misses      = 0
+        self._puts       = 0
+        self._refreshing = set()
+        self._lock       = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key         TEXT PRIMARY KEY,
+                body        TEXT NOT NULL,
+                fetched_at  REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+
+    @staticmethod
+    def make_key(q: str, lang_restrict: str, start_index: int, max_results: int) -> str:
+        return json.dumps([q, lang_restrict or "", int(start_index), int(max_results)])
+
+    def _get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key))
+        return row
+
+    def _put(self, key, body):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(body), now, now))
+            self._puts += 1
+            if self._puts % self.EVICT_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (excess,))
+
+    def _refresh(self, key, fetch_fn):
+        try:
+            self._put(key, fetch_fn())
+        except Exception:
+            logger.warning("Background refresh failed for %s", key, exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh_async(self, key, fetch_fn):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, fetch_fn),
+                         daemon=True).start()
+
+    def fetch(self, key: str, fetch_fn):
+        """Return the body for `key`, calling `fetch_fn()` when missing or expired.
+
+        `fetch_fn` should raise on failure so that errors are never cached.
+        """
+        row = self._get(key)
+        if row is not None:
+            body, fetched_at = row
+            age = time.time() - fetched_at
+            if age <= self.ttl:
+                self.hits += 1
+                return json.loads(body)
+            if age <= self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh_async(key, fetch_fn)
+                return json.loads(body)
+
+        self.misses += 1
+        body = fetch_fn()
+        self._put(key, body)
+        return body
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._conn.execute(
+                "SELECT COUNT(*) FROM responses").fetchone()
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "entries":    entries,
+            "hits":       self.hits,
+            "stale_hits": self.stale_hits,
+            "misses":     self.misses,
+            "hit_rate":   (self.hits + self.stale_hits) / total if total else 0.0,
+        }
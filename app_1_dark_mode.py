@@ -1,11 +1,28 @@
-import gradio as gr
 import os
-from config import LANGUAGES, SEARCH_MODES, SORT_BY_OPTIONS, LOGO_PATH
-from manager import DynamicBookManager
-from recommender import BookRecommender
+import time
+from config import (LANGUAGES, SEARCH_MODES, SORT_BY_OPTIONS, LOGO_PATH, WARMUP_TIMEOUT,
+                    METRICS_HOST, METRICS_PORT, PROFILE_SLOW_REQUESTS, PROFILE_DIR, PROFILE_KEEP, PROFILE_INTERVAL)
+from cards import CARD_CSS
+from warmup import Engine, build_library
+import metrics
+from validation import validate_book
+
+# Catalog, index and model load in the background (overlapping the gradio
+# import below); handlers wait for them via engine(). Spawned encoding
+# workers re-import this module as __mp_main__ and must not start their own.
+_engine = Engine(build_library)
+if __name__ == "__main__":
+    _engine.start()
+
+import gradio as gr
 
-manager = DynamicBookManager()
-reco = BookRecommender()
+
+def engine():
+    """(manager, reco) once warm; early requests block here in the queue."""
+    try:
+        return _engine.get(WARMUP_TIMEOUT)
+    except (TimeoutError, RuntimeError):
+        raise gr.Error(_engine.status())
 
 CATEGORIES = [
     "American Fiction", "Fiction", "Romance", "Fantasy", "Adventure",
@@ -15,7 +32,6 @@ CATEGORIES = [
 ]
 
 THEME_CSS = """
-<style>
 :root {
   --bg: #ffffff;
   --fg: #1f2937;
@@ -146,13 +162,16 @@ input:checked + .slider {
 input:checked + .slider:before {
   transform: translateX(26px);
 }
-</style>
+"""
 
+# Page script goes in <head>; css= must stay plain CSS
+THEME_JS = """
 <script>
 document.addEventListener("DOMContentLoaded", function () {
   const toggle = document.querySelector(".switch input");
   const savedTheme = localStorage.getItem("theme") || "light";
   document.documentElement.setAttribute("data-theme", savedTheme);
+  if (!toggle) return;     // header not rendered yet
   toggle.checked = savedTheme === "dark";
 
   toggle.addEventListener("change", function () {
@@ -164,59 +183,45 @@ document.addEventListener("DOMContentLoaded", function () {
 </script>
 """
 
+def engine_status_ui():
+    # Streams the status line until the engine is warm
+    while not _engine.ready.is_set():
+        yield _engine.status()
+        time.sleep(0.5)
+    yield _engine.status()
+
+def recommend_ui(*args):
+    if not _engine.ready.is_set():
+        yield f"<p class='no-results'>{_engine.status()}</p>"
+    manager, reco = engine()
+    # Local cards show as soon as FAISS returns; external ones follow
+    for locals, externals in reco.recommend_stream(*args):
+        yield reco.format_books(locals, externals)
+
 def add_book_ui(isbn13, isbn10, title, subtitle, authors, categories,
                 thumbnail, description, published_year,
                 average_rating, num_pages, ratings_count):
-    if not (isbn13.isdigit() and len(isbn13) == 13):
-        return "❌ ISBN13 must be exactly 13 digits."
-    if not (isbn10.isdigit() and len(isbn10) == 10):
-        return "❌ ISBN10 must be exactly 10 digits."
-    if not title.strip():
-        return "❌ Title cannot be empty."
-    if not categories:
-        return "❌ Please select at least one category."
-    try:
-        y = int(published_year)
-        if y < 1000 or y > 9999:
-            raise ValueError()
-    except:
-        return "❌ Published Year must be a four-digit year."
-    try:
-        r = float(average_rating)
-        if r < 0 or r > 5:
-            raise ValueError()
-    except:
-        return "❌ Average Rating must be between 0 and 5."
-    try:
-        p = int(num_pages)
-        if p < 1:
-            raise ValueError()
-    except:
-        return "❌ Num Pages must be a positive integer."
-    try:
-        rc = int(ratings_count)
-        if rc < 0:
-            raise ValueError()
-    except:
-        return "❌ Ratings Count must be a non-negative integer."
-
-    details = {
-        "isbn13": isbn13,
-        "isbn10": isbn10,
-        "title": title.strip(),
-        "subtitle": subtitle.strip(),
-        "authors": authors.strip(),
-        "categories": ",".join(categories),
-        "thumbnail": thumbnail.strip(),
-        "description": description.strip(),
-        "published_year": y,
-        "average_rating": r,
-        "num_pages": p,
-        "ratings_count": rc
-    }
+    details, error = validate_book({
+        "isbn13": isbn13, "isbn10": isbn10, "title": title, "subtitle": subtitle,
+        "authors": authors, "categories": categories, "thumbnail": thumbnail,
+        "description": description, "published_year": published_year,
+        "average_rating": average_rating, "num_pages": num_pages,
+        "ratings_count": ratings_count,
+    })
+    if error:
+        return error
+    manager, _ = engine()
     return manager.add_book(details)
 
-with gr.Blocks(css=THEME_CSS, title="Iqraa Digital Library") as app:
+def remove_book_ui(title):
+    manager, _ = engine()
+    return manager.remove_book(title)
+
+def remove_isbn_ui(isbn):
+    manager, _ = engine()
+    return manager.remove_book_by_isbn(isbn)
+
+with gr.Blocks(css=THEME_CSS + CARD_CSS, head=THEME_JS, title="Iqraa Digital Library") as app:
     logo_web_path = f"/file/{LOGO_PATH.replace(os.sep, '/')}"
     gr.HTML(f"""
 <header>
@@ -234,6 +239,9 @@ with gr.Blocks(css=THEME_CSS, title="Iqraa Digital Library") as app:
 </header>
 """)
 
+    status = gr.Markdown(_engine.status())
+    app.load(fn=engine_status_ui, outputs=status)
+
     with gr.Tabs():
         with gr.TabItem("🔎 Recommend"):
             gr.Markdown("Enter your prompt and adjust filters below:")
@@ -248,7 +256,7 @@ with gr.Blocks(css=THEME_CSS, title="Iqraa Digital Library") as app:
                 min_rating= gr.Slider(0, 5,  value=0.0, step=0.5, label="Min. Avg Rating")
             btn    = gr.Button("🔍 Get Recommendations", variant="primary")
             output = gr.HTML()
-            btn.click(fn=lambda *args: reco.format_books(*reco.recommend(*args)),
+            btn.click(fn=recommend_ui,
                       inputs=[query, language, local_n, external_n, min_rating, search_mode, sort_by],
                       outputs=output)
 
@@ -279,9 +287,17 @@ with gr.Blocks(css=THEME_CSS, title="Iqraa Digital Library") as app:
             rem     = gr.Textbox(label="Book Title to Remove")
             rem_out = gr.Textbox(interactive=False)
             gr.Button("✂️ Remove Book", variant="danger") \
-              .click(fn=manager.remove_book, inputs=rem, outputs=rem_out)
+              .click(fn=remove_book_ui, inputs=rem, outputs=rem_out)
+            rem_isbn = gr.Textbox(label="…or ISBN13 / ISBN10 to Remove")
+            gr.Button("✂️ Remove by ISBN", variant="danger") \
+              .click(fn=remove_isbn_ui, inputs=rem_isbn, outputs=rem_out)
 
     gr.Markdown("<hr/>Built by DiploTech Solutions")
 
 if __name__ == "__main__":
+    if METRICS_PORT:
+        metrics.start_server(METRICS_PORT, METRICS_HOST)
+    if PROFILE_SLOW_REQUESTS:
+        metrics.enable_profiler(PROFILE_DIR, PROFILE_KEEP, PROFILE_INTERVAL)
+    app.queue()     # generator handlers stream through the queue
     app.launch()
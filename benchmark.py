@@ -0,0 +1,322 @@
+# benchmark.py
+
+"""
+Micro-benchmarks for the recommendation and catalog hot paths:
+- BookRecommender.embed, _search_local (ranked and ISBN), sanitize, recommend,
+  format_books
+- _search_external against a local stub HTTP server standing in for Google Books
+- DynamicBookManager cold startup, add_book and remove_book, plus the
+  persistence they defer: journal flush and snapshot compaction
+
+Everything runs in a scratch directory on a synthetic catalog, so the real
+data, index and caches are never touched. Results are written as JSON and
+can be compared against a stored baseline:
+
+    python benchmark.py --books 5000 --out bench.json --save-baseline
+    python benchmark.py --books 5000 --baseline bench_baseline.json
+
+Exits with status 1 when any benchmark's p50 is slower than the baseline by
+more than --tolerance.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+WORDS = ("ancient river shadow empire garden winter letters stranger city ocean "
+         "war love secret machine kingdom journey memory island night fire "
+         "detective murder family dragon star colony queen storm forest child "
+         "history science mind silence mountain voyage revolution music ghost").split()
+LANGS = ["en"] * 8 + ["fr", "de"]
+QUERIES = [
+    "a detective story in a rainy city",
+    "epic fantasy with dragons and a lost kingdom",
+    "letters between two strangers during the war",
+    "a science fiction voyage to a distant colony",
+    "family secrets on a small island",
+    "history of music and revolution",
+    "a ghost story set in winter",
+    "coming of age journey across the mountains",
+]
+
+
+# --- Synthetic data ---------------------------------------------------------
+
+def _sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+
+def synthetic_book(rng, i: int) -> dict:
+    return {
+        "book_id":        i,
+        "isbn13":         str(9780000000000 + i),
+        "isbn10":         str(1000000000 + i),
+        "title":          f"{_sentence(rng, 3)} {i}",
+        "subtitle":       "",
+        "authors":        f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+        "categories":     rng.choice(["Fiction", "History", "Science", "Fantasy"]),
+        "thumbnail":      f"http://books.example/{i}.jpg",
+        "description":    ". ".join(_sentence(rng, 12) for _ in range(4)),
+        "published_year": rng.randint(1900, 2024),
+        "average_rating": round(rng.uniform(2.5, 5.0), 2),
+        "num_pages":      rng.randint(80, 900),
+        "ratings_count":  rng.randint(0, 50_000),
+        "language":       rng.choice(LANGS),
+    }
+
+
+def write_catalog(csv_path: str, n_books: int, seed: int = 0):
+    import pandas as pd
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+    pd.DataFrame([synthetic_book(rng, i) for i in range(n_books)]).to_csv(csv_path, index=False)
+
+
+# --- Stub Google Books server -----------------------------------------------
+
+class StubBooksHandler(BaseHTTPRequestHandler):
+    """Answers /volumes like Google Books: deterministic items for any query."""
+
+    latency = 0.0
+    total   = 400       # totalItems per query; pages past it come back empty
+
+    def do_GET(self):
+        qs    = parse_qs(urlparse(self.path).query)
+        start = int(qs.get("startIndex", ["0"])[0])
+        count = int(qs.get("maxResults", ["10"])[0])
+        lang  = qs.get("langRestrict", ["en"])[0]
+        rng   = random.Random(f"{qs.get('q', [''])[0]}:{start}")
+        items = []
+        for i in range(start, min(start + count, self.total)):
+            b = synthetic_book(rng, i)
+            items.append({"volumeInfo": {
+                "title":         b["title"],
+                "authors":       [b["authors"]],
+                "description":   b["description"],
+                "imageLinks":    {"thumbnail": b["thumbnail"]},
+                "averageRating": b["average_rating"],
+                "ratingsCount":  b["ratings_count"],
+                "infoLink":      b["thumbnail"],
+                "language":      lang,
+            }})
+        if self.latency:
+            time.sleep(self.latency)
+        body = json.dumps({"totalItems": self.total, "items": items}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(latency: float):
+    StubBooksHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBooksHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/books/v1/volumes"
+
+
+# --- Timing -----------------------------------------------------------------
+
+def timed(fn, repeat: int, warmup: int = 1) -> dict:
+    """Run `fn(i)` `warmup` + `repeat` times; latency stats in ms."""
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn(warmup + i)
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "n":       len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms":  round(samples[len(samples) // 2], 3),
+        "p95_ms":  round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "min_ms":  round(samples[0], 3),
+    }
+
+
+def once(fn) -> dict:
+    return timed(lambda i: fn(), repeat=1, warmup=0)
+
+
+# --- Suite ------------------------------------------------------------------
+
+def run_suite(args) -> dict:
+    # Imported here: config needs the environment set up by main() first
+    from config import CSV_PATH, LANGUAGES
+    from manager import DynamicBookManager
+    from recommender import BookRecommender
+
+    write_catalog(CSV_PATH, args.books, args.seed)
+    results = {}
+    n = args.repeat
+    q = lambda i: QUERIES[i % len(QUERIES)]
+    # Defeats the query and API caches; each benchmark gets its own suffix so
+    # one never runs warm on prompts an earlier one already embedded or fetched
+    unique_q = lambda name, i: f"{q(i)} {name} {i}"
+
+    # Catalog: cold start encodes every book, warm start hits the embedding cache
+    logger.info("Cold startup over %d books", args.books)
+    results["manager.startup_cold"] = once(DynamicBookManager)
+    results["manager.startup_warm"] = once(DynamicBookManager)
+    manager = DynamicBookManager()
+    reco = BookRecommender(catalog=manager.catalog)
+    lang = "English"
+
+    # Recommender hot paths
+    results["recommender.embed"] = timed(lambda i: reco.embed([unique_q("embed", i)]), n)
+    results["recommender.embed_query_cached"] = timed(lambda i: reco.embed_query(q(i)), n)
+    results["recommender.search_local"] = timed(
+        lambda i: reco._search_local(q(i), LANGUAGES[lang], 50), n)
+    isbns = [str(b["isbn13"]) for b in list(manager.metadata.values())[:50]]
+    results["recommender.search_local_isbn"] = timed(
+        lambda i: reco._search_local(isbns[i % len(isbns)], "", 50), n)
+    raw = [manager.metadata[b] for b in list(manager.metadata)[:100]]
+    results["recommender.sanitize_x100"] = timed(
+        lambda i: [reco.sanitize(r, "Local") for r in raw], n)
+    results["recommender.search_external_uncached"] = timed(
+        lambda i: reco._search_external(unique_q("external", i), LANGUAGES[lang], 50), n)
+    results["recommender.search_external_cached"] = timed(
+        lambda i: reco._search_external(q(i), LANGUAGES[lang], 50), n)
+    results["recommender.recommend"] = timed(
+        lambda i: reco.recommend(unique_q("recommend", i), lang, 10, 10, 3.5, "Both", "Rating"), n)
+    locals_, externals = reco.recommend(q(0), lang, 10, 10, 3.5, "Both", "Rating")
+    results["recommender.format_books"] = timed(
+        lambda i: reco.format_books(locals_, externals), n)
+
+    # Catalog mutations: each call updates memory and queues one journal
+    # entry; the durable write and the snapshot are timed separately below
+    rng = random.Random(args.seed + 1)
+    added = []
+    def add(i):
+        # Ids / ISBNs past the catalog, so the book is not rejected as a duplicate
+        book = synthetic_book(rng, args.books + len(added))
+        book.pop("book_id")
+        book["title"] = f"Benchmark addition {len(added)}"
+        manager.add_book(book)
+        added.append(book["title"])
+    results["manager.add_book"] = timed(add, args.mutations)
+    results["manager.remove_book"] = timed(
+        lambda i: manager.remove_book(added[i]), args.mutations - 1)
+
+    # Persistence: one journal group commit (fsync), and one compaction
+    # (CSV, columnar metadata and index written to a new snapshot)
+    def add_flushed(i):
+        add(i)
+        manager.flush()
+    results["manager.add_book_flushed"] = timed(add_flushed, args.mutations)
+    def add_compacted(i):
+        add(i)
+        manager.compact()
+    results["manager.compact"] = timed(add_compacted, args.mutations)
+    return results
+
+
+# --- Baseline comparison ----------------------------------------------------
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Benchmarks whose p50 regressed by more than `tolerance` (a fraction)."""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("p50_ms"):
+            continue
+        ratio = cur["p50_ms"] / base["p50_ms"]
+        cur["baseline_p50_ms"] = base["p50_ms"]
+        cur["ratio"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark recommendation and catalog hot paths")
+    parser.add_argument("--books", type=int, default=2000, help="synthetic catalog size")
+    parser.add_argument("--repeat", type=int, default=30, help="timed runs per benchmark")
+    parser.add_argument("--mutations", type=int, default=5, help="add/remove runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub-latency", type=float, default=0.02,
+                        help="seconds the stub Google Books server waits per page")
+    parser.add_argument("--out", default="bench.json", help="where to write results")
+    parser.add_argument("--baseline", default="bench_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="also store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed p50 slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--workdir", default=None,
+                        help="scratch directory (default: a fresh temp dir, removed after)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    out      = os.path.abspath(args.out)
+    baseline = os.path.abspath(args.baseline)
+
+    server, url = start_stub_server(args.stub_latency)
+    os.environ["GOOGLE_BOOKS_URL"] = url
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    workdir = args.workdir or tempfile.mkdtemp(prefix="library-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)       # every relative path in config now lands here
+    try:
+        results = run_suite(args)
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = []
+    if os.path.exists(baseline) and not args.save_baseline:
+        with open(baseline, "r") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+
+    report = {
+        "meta": {
+            "books":     args.books,
+            "repeat":    args.repeat,
+            "python":    platform.python_version(),
+            "platform":  platform.platform(),
+            "cpus":      os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results":     results,
+        "regressions": regressions,
+    }
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(baseline, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for name, r in results.items():
+        flag = "  REGRESSION" if name in regressions else ""
+        vs = f"  x{r['ratio']:.2f} vs baseline" if "ratio" in r else ""
+        print(f"{name:45s} p50 {r['p50_ms']:10.3f} ms  p95 {r['p95_ms']:10.3f} ms{vs}{flag}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# book_lookup.py
+
+"""
+BookLookup:
+- In-memory hash indexes from normalised title, ISBN-13 and ISBN-10 to book ids
+- O(1) lookups for removal by title / ISBN and duplicate checks at add time
+- Kept in sync by the managers on every add and remove
+"""
+
+
+def normalize_title(value) -> str:
+    return " ".join(str(value or "").casefold().split())
+
+
+def _isbn(value, width: int) -> str:
+    if isinstance(value, float):
+        if value != value:
+            return ""
+        value = int(value)
+    s = "".join(c for c in str(value or "").upper() if c.isdigit() or c == "X")
+    # Numeric CSV columns drop leading zeros
+    if s.isdigit() and 0 < len(s) < width:
+        s = s.zfill(width)
+    return s
+
+
+def normalize_isbn13(value) -> str:
+    return _isbn(value, 13)
+
+
+def normalize_isbn10(value) -> str:
+    return _isbn(value, 10)
+
+
+class BookLookup:
+    """Field value -> set of book ids, for title, isbn13 and isbn10."""
+
+    FIELDS = {
+        "title":  normalize_title,
+        "isbn13": normalize_isbn13,
+        "isbn10": normalize_isbn10,
+    }
+
+    def __init__(self):
+        self._maps = {field: {} for field in self.FIELDS}
+
+    @classmethod
+    def build(cls, items) -> "BookLookup":
+        """From (book_id, record) pairs."""
+        lookup = cls()
+        for book_id, book in items:
+            lookup.add(book_id, book)
+        return lookup
+
+    def _keys(self, book: dict):
+        for field, norm in self.FIELDS.items():
+            key = norm(book.get(field))
+            if key:
+                yield field, key
+
+    def add(self, book_id: int, book: dict):
+        for field, key in self._keys(book):
+            self._maps[field].setdefault(key, set()).add(int(book_id))
+
+    def remove(self, book_id: int, book: dict):
+        for field, key in self._keys(book):
+            ids = self._maps[field].get(key)
+            if ids is not None:
+                ids.discard(int(book_id))
+                if not ids:
+                    del self._maps[field][key]
+
+    def find(self, field: str, value) -> set:
+        key = self.FIELDS[field](value)
+        return set(self._maps[field].get(key, ())) if key else set()
+
+    def find_isbn(self, value) -> set:
+        """Ids for an ISBN given in either form (hyphens and spaces ignored)."""
+        digits = "".join(c for c in str(value or "").upper() if c.isdigit() or c == "X")
+        if len(digits) == 13:
+            return self.find("isbn13", digits)
+        if len(digits) == 10:
+            return self.find("isbn10", digits)
+        return set()
+
+    def duplicate_of(self, book: dict):
+        """(field, value) of the first ISBN already in the catalog, else None."""
+        for field in ("isbn13", "isbn10"):
+            if self.find(field, book.get(field)):
+                return field, self.FIELDS[field](book.get(field))
+        return None
@@ -1,47 +1,74 @@
-import pickle
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from models import get_encoder
+from book_lookup import BookLookup
+from metastore import load_metadata, write_columnar, ColumnarMetadata
 
 class DynamicBookManager:
-    def __init__(self, index_path="book_index.faiss", metadata_path="books_metadata.pkl"):
+    def __init__(self, index_path="book_index.faiss", metadata_path="books_metadata",
+                 legacy_metadata_path="books_metadata.pkl"):
         self.index_path = index_path
         self.metadata_path = metadata_path
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+        self.legacy_metadata_path = legacy_metadata_path
+        self.model = get_encoder("all-MiniLM-L6-v2")
         self.load_data()
 
     def load_data(self):
         self.index = faiss.read_index(self.index_path)
-        with open(self.metadata_path, 'rb') as f:
-            self.metadata = pickle.load(f)
+        metadata = load_metadata(self.metadata_path, self.legacy_metadata_path)
+        if isinstance(metadata, ColumnarMetadata):
+            # The columnar store is read-only; edits work on a dict copy
+            metadata = {int(i): metadata.record(r) for r, i in enumerate(metadata.ids)}
+        # Older artifacts store a plain list aligned with index positions;
+        # re-key them by position so books can be removed by id.
+        if isinstance(metadata, list):
+            vecs = self.index.reconstruct_n(0, self.index.ntotal)
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.index.d))
+            if len(vecs):
+                self.index.add_with_ids(vecs, np.arange(len(vecs), dtype='int64'))
+            metadata = dict(enumerate(metadata))
+        elif hasattr(self.index, "id_map") and \
+                hasattr(faiss.downcast_index(self.index.index), "hnsw"):
+            # HNSW cannot remove ids; edit an exact copy of its vectors instead
+            ids = faiss.vector_to_array(self.index.id_map).astype('int64')
+            vecs = self.index.index.reconstruct_n(0, self.index.ntotal)
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.index.d))
+            if len(vecs):
+                self.index.add_with_ids(vecs, ids)
+        self.metadata = metadata
+        self.next_id = max(self.metadata, default=-1) + 1
+        self.lookup = BookLookup.build(self.metadata.items())
 
     def save_data(self):
         faiss.write_index(self.index, self.index_path)
-        with open(self.metadata_path, 'wb') as f:
-            pickle.dump(self.metadata, f)
+        records = [dict(book, book_id=book_id) for book_id, book in self.metadata.items()]
+        columns = ["book_id"]
+        for book in records:
+            columns.extend(c for c in book if c not in columns)
+        write_columnar(self.metadata_path, records, columns)
 
     def embed(self, text):
-        emb = self.model.encode([text], convert_to_numpy=True)
-        return (emb / np.linalg.norm(emb)).astype('float32')
+        return self.model.encode([text])
 
     def add_book(self, book_details):
+        if self.lookup.duplicate_of(book_details):
+            return "Book already exists."
+        book_id = self.next_id
+        self.next_id += 1
         desc = f"{book_details['title']}. {book_details['description']}"
         embedding = self.embed(desc)
-        self.index.add(embedding)
-        self.metadata.append(book_details)
+        self.index.add_with_ids(embedding, np.array([book_id], dtype='int64'))
+        self.metadata[book_id] = book_details
+        self.lookup.add(book_id, book_details)
         self.save_data()
         return "Book successfully added."
 
     def remove_book(self, title):
-        idx_to_remove = next((i for i, b in enumerate(self.metadata) if b['title'].lower() == title.lower()), None)
-        if idx_to_remove is None:
+        id_to_remove = min(self.lookup.find("title", title), default=None)
+        if id_to_remove is None:
             return "Book not found."
 
-        self.metadata.pop(idx_to_remove)
-
-        embeddings = np.vstack([self.embed(f"{b['title']}. {b['description']}") for b in self.metadata])
-        self.index = faiss.IndexFlatIP(embeddings.shape[1])
-        self.index.add(embeddings)
+        self.lookup.remove(id_to_remove, self.metadata.pop(id_to_remove))
+        self.index.remove_ids(np.array([id_to_remove], dtype='int64'))
         self.save_data()
         return "Book successfully removed."
-
@@ -0,0 +1,117 @@
+# bulk_import.py
+
+"""
+Bulk catalog import from CSV or JSONL files:
+- Every row is checked with the same rules as the Add Book form, and
+  rejected if its ISBN is already in the catalog or earlier in the input
+- Valid rows are encoded in batches, inserted into the index in one
+  operation and persisted once (DynamicBookManager.add_books)
+- Invalid rows are reported with their file and line number
+
+    python bulk_import.py new_acquisitions.csv more_books.jsonl [--strict] [--dry-run]
+
+Run it while the app is stopped, or call import_books() with the app's own
+manager, so only one process writes the catalog files.
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+import pandas as pd
+from validation import validate_book
+from book_lookup import BookLookup
+
+logger = logging.getLogger(__name__)
+
+
+def read_rows(path: str):
+    """Yield (line number, raw record) from a .csv or .jsonl/.ndjson file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        # Strings throughout: ISBNs must not turn into floats
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        for i, rec in enumerate(df.to_dict(orient="records")):
+            yield i + 2, rec            # header is line 1
+    elif ext in (".jsonl", ".ndjson"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_no, json.loads(line)
+    else:
+        raise ValueError(f"Unsupported file type {ext!r}; expected .csv or .jsonl")
+
+
+def validate_files(paths, manager=None) -> tuple:
+    """Return (valid details list, [(path, line, error), ...]).
+
+    With a `manager`, ISBNs already in its catalog count as errors too.
+    """
+    valid, errors = [], []
+    seen = BookLookup()
+    for path in paths:
+        for line_no, raw in read_rows(path):
+            details, error = validate_book(raw)
+            dup = None
+            if not error:
+                dup = seen.duplicate_of(details) or \
+                      (manager.find_duplicate(details) if manager is not None else None)
+            if dup:
+                error = f"❌ Duplicate {dup[0].upper()} {dup[1]}."
+            if error:
+                errors.append((path, line_no, error))
+            else:
+                seen.add(len(valid), details)
+                valid.append(details)
+    return valid, errors
+
+
+def import_books(manager, paths, strict: bool = False, dry_run: bool = False) -> dict:
+    """Validate `paths` and add the valid rows through `manager` in one batch.
+
+    Rows whose ISBN is already in the catalog (or earlier in the input) are
+    rejected as duplicates. With `strict`, nothing is added if any row is
+    invalid.
+    """
+    valid, errors = validate_files(paths, manager)
+    added = []
+    if not dry_run and valid and not (strict and errors):
+        added = manager.add_books(valid)
+    return {
+        "valid":    len(valid),
+        "added":    len(added),
+        "rejected": len(errors),
+        "errors":   [{"file": p, "line": n, "error": e} for p, n, e in errors],
+        "book_ids": [int(i) for i in added],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import books from CSV/JSONL files")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--strict", action="store_true",
+                        help="add nothing if any row fails validation")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="validate only; do not touch the catalog")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    manager = None
+    if not args.dry_run:
+        from manager import DynamicBookManager      # loads the model + catalog
+        manager = DynamicBookManager()
+    report = import_books(manager, args.files, strict=args.strict, dry_run=args.dry_run)
+    if manager is not None:
+        manager.compact()       # write snapshot files before exiting
+
+    for err in report["errors"]:
+        logger.warning("%s:%d: %s", err["file"], err["line"], err["error"])
+    logger.info("%d valid, %d added, %d rejected",
+                report["valid"], report["added"], report["rejected"])
+    print(json.dumps({k: v for k, v in report.items() if k != "errors"}))
+    sys.exit(1 if report["rejected"] and args.strict else 0)
+
+
+if __name__ == "__main__":
+    main()
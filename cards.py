@@ -0,0 +1,29 @@
+# cards.py
+
+"""
+Result card styling shared by BookRecommender and the Gradio apps. Kept free
+of heavy imports so the apps can build their page before the search engine
+has loaded.
+"""
+
+# Card styles, included once in the page CSS by the apps instead of being
+# repeated inline on every card (plain CSS: it is passed to gr.Blocks(css=))
+CARD_CSS = """
+.book-grid { display:grid; grid-template-columns:repeat(auto-fill,minmax(240px,1fr)); gap:1rem; }
+.book-grid > h2, .book-grid > .no-results { grid-column:1/-1; }
+.book-card {
+  background:var(--card-bg); color:var(--card-fg);
+  border-radius:8px; box-shadow:0 2px 8px rgba(0,0,0,0.1);
+  overflow:hidden; display:flex; flex-direction:column;
+}
+.book-card img { width:100%; aspect-ratio:2/3; object-fit:cover; }
+.book-card .card-body { padding:1rem; flex:1; display:flex; flex-direction:column; }
+.book-card h3 { margin:0 0 .5rem; font-size:1.1rem; }
+.book-card p { margin:0; font-size:.9rem; color:var(--subtle); }
+.book-card .rating { margin:.5rem 0; }
+.book-card .desc { flex:1; margin:0 0 .75rem; overflow:hidden; max-height:4.5rem; }
+.book-card a { text-decoration:none; color:var(--link); font-weight:500; }
+"""
+
+# Only ~3 lines of the description are visible on a card
+CARD_DESC_CHARS = 300
@@ -0,0 +1,209 @@
+# catalog.py
+
+"""
+Catalog snapshots shared between DynamicBookManager and BookRecommender:
+- CatalogSnapshot: (generation, index, metadata) triple, plus the writer's
+  lexical index when it maintains one
+- Catalog: in-process publisher; readers grab the current snapshot
+  lock-free. A manager publishes a LayeredIndex view per edit (the base
+  index is shared, never mutated), so edits neither copy the catalog nor
+  make searches wait
+- Generation file: cross-process publication of on-disk snapshots; it is
+  also the manifest naming the snapshot directory that holds the CSV,
+  metadata and index of that generation, so the three never mix
+- CatalogWatcher: polls the generation file and the journal; republishes
+  new snapshots and the edits journaled after them
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    generation: int
+    index:      object
+    metadata:   object
+    lexical:    object = None
+
+
+class Catalog:
+    """Holds the current snapshot. Publishing swaps a single reference, so
+    readers never block and always see a complete index + metadata pair."""
+
+    def __init__(self, generation: int = 0):
+        self._snapshot   = None
+        self._generation = generation
+        self._lock       = threading.Lock()   # serialises publishers only
+
+    def current(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    def publish(self, index, metadata, generation: int = None,
+                lexical=None) -> CatalogSnapshot:
+        with self._lock:
+            if generation is None:
+                generation = self._generation + 1
+            self._generation = max(self._generation, generation)
+            snap = CatalogSnapshot(generation, index, metadata, lexical)
+            self._snapshot = snap
+        return snap
+
+
+# Files inside one snapshot directory
+SNAPSHOT_FILES = {"csv": "books.csv", "metadata": "metadata", "index": "index.faiss"}
+
+
+def fsync_tree(path: str):
+    """fsync a file, or every file under a directory plus the directories."""
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in files:
+                fsync_tree(os.path.join(root, name))
+        flags = os.O_RDONLY
+    else:
+        flags = os.O_RDWR
+    try:
+        fd = os.open(path, flags)
+    except OSError:
+        return                  # directories cannot be opened on Windows
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, write_fn):
+    """Write via `write_fn(tmp_path)`, make it durable, then rename over `path`."""
+    tmp = f"{path}.tmp"
+    write_fn(tmp)
+    fsync_tree(tmp)
+    os.replace(tmp, path)
+
+
+def snapshot_dir(root: str, generation: int) -> str:
+    return os.path.join(root, f"gen-{generation:08d}")
+
+
+def snapshot_path(info: dict, kind: str) -> str:
+    """Path of `kind` ("csv", "metadata", "index") in the manifest's snapshot."""
+    return os.path.join(info["snapshot"], SNAPSHOT_FILES[kind])
+
+
+def write_snapshot(root: str, generation: int, write_fn) -> str:
+    """Let `write_fn(tmp_dir)` fill a new snapshot directory; fsync and
+    rename it into place. Returns the final directory."""
+    final = snapshot_dir(root, generation)
+    tmp = f"{final}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    shutil.rmtree(final, ignore_errors=True)    # orphan of an uncommitted run
+    os.makedirs(tmp)
+    write_fn(tmp)
+    fsync_tree(tmp)
+    os.rename(tmp, final)
+    fsync_tree(root)
+    return final
+
+
+def gc_snapshots(root: str, keep):
+    """Remove snapshot directories not in `keep` (current + previous)."""
+    keep = {os.path.abspath(k) for k in keep if k}
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith("gen-") and os.path.abspath(path) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def read_generation(path: str) -> dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_generation(path: str, generation: int, complete: bool, **extra):
+    # Writers mark a generation incomplete before touching the snapshot
+    # files and complete afterwards; readers only load complete ones.
+    # `extra` carries writer bookkeeping (journal seq, next book id).
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump({"generation": generation, "complete": complete, **extra}, f)
+    atomic_write(path, write)
+
+
+class CatalogWatcher(threading.Thread):
+    """Background poller that loads a newer on-disk generation and publishes
+    it, together with the journal entries appended after that snapshot."""
+
+    def __init__(self, catalog: Catalog, gen_path: str, load_fn, interval: float,
+                 journal_path: str = None, tail_fn=None, apply_fn=None):
+        super().__init__(daemon=True, name="catalog-watcher")
+        self.catalog  = catalog
+        self.gen_path = gen_path
+        self.load_fn  = load_fn      # (manifest) -> (index, metadata)
+        self.interval = interval
+        self.journal_path = journal_path
+        self.tail_fn  = tail_fn      # (after_seq) -> journal entries
+        self.apply_fn = apply_fn     # (index, metadata, entries) -> (index, metadata)
+        self._seen    = None         # file stamps at the last check
+        self._loaded  = None         # manifest of the published snapshot
+        self._seq     = 0            # last journal seq applied on top of it
+
+    def _stamps(self):
+        stamps = []
+        for path in (self.gen_path, self.journal_path):
+            try:
+                st = os.stat(path)
+                stamps.append((st.st_mtime_ns, st.st_size))
+            except (FileNotFoundError, TypeError):
+                stamps.append(None)
+        return tuple(stamps)
+
+    def check(self) -> bool:
+        stamps = self._stamps()
+        if stamps[0] is None or stamps == self._seen:
+            return False
+
+        info = read_generation(self.gen_path)
+        if not info or not info.get("complete"):
+            return False          # writer in progress; retry next tick
+        current = self.catalog.current()
+        reload = current is None or self._loaded is None \
+                 or info["generation"] != self._loaded["generation"]
+        if reload:
+            index, metadata = self.load_fn(info)
+            seq = info.get("journal_seq", 0)
+        else:
+            index, metadata, seq = current.index, current.metadata, self._seq
+        entries = list(self.tail_fn(seq)) if self.tail_fn else []
+        if not reload and not entries:
+            self._seen = stamps
+            return False
+        # Compaction truncates the journal only after committing the
+        # manifest, so an unchanged manifest means no entries were dropped
+        if read_generation(self.gen_path) != info:
+            return False          # writer moved on while we were loading
+        if entries:
+            index, metadata = self.apply_fn(index, metadata, entries)
+            seq = entries[-1]["seq"]
+        self.catalog.publish(index, metadata)
+        self._seen, self._loaded, self._seq = stamps, info, seq
+        return True
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Failed to reload catalog from %s", self.gen_path)
@@ -14,7 +14,118 @@ import os
 DATA_DIR    = "data/Kaggle_7k_books"
 CSV_PATH    = r"data/Kaggle_7k_books/books.csv"
 INDEX_PATH  = "book_index.faiss"
-META_PATH   = "books_metadata.pkl"
+META_PATH   = "books_metadata.pkl"       # legacy pickle, still readable
+META_DIR    = "books_metadata"           # columnar store (see metastore.py)
+
+# FAISS index (see indexing.py; `python indexing.py` benchmarks the options)
+# INDEX_TYPE:    "flat" (exact), "hnsw", "ivf_flat" or "ivf_pq"
+# INDEX_STORAGE: "flat" (float32), "fp16" (half) or "sq8" (8-bit scalar
+#                quantized, trained on the catalog); ignored by ivf_pq
+# INDEX_MMAP lets recommender processes share the index through the page
+# cache instead of each reading it into RAM.
+INDEX_TYPE    = "flat"
+INDEX_STORAGE = "flat"
+INDEX_MMAP    = True
+INDEX_PARAMS  = {
+    "hnsw_m":               32,
+    "hnsw_ef_construction": 200,
+    "hnsw_ef_search":       64,
+    "ivf_nlist":            1024,
+    "ivf_nprobe":           16,
+    "pq_m":                 48,
+    "pq_nbits":             8,
+    "train_size":           100_000,
+}
+# Queries sampled to log recall@10 / p50 / p99 after building a lossy index
+INDEX_BENCH_QUERIES = 200
+
+# Embedding model + on-disk cache of book embeddings (see embedding_cache.py)
+EMBED_MODEL   = "all-MiniLM-L6-v2"
+EMB_CACHE_DIR = "embedding_cache"
+# Inference backend (see embedding_backends.py): "torch" (reference), "int8"
+# (dynamically quantized, CPU) or "onnx" (exported graph on onnxruntime).
+# Changing it re-encodes the catalog once, into a separate cache.
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+
+# Bulk encoding on CPU build boxes (see encoding_pool.py): with more than one
+# worker, encodes of at least ENCODE_POOL_MIN_TEXTS texts are spread over
+# worker processes. ENCODE_TORCH_THREADS=None splits the cores evenly.
+ENCODE_WORKERS        = 1
+ENCODE_BATCH_SIZE     = 64
+ENCODE_TORCH_THREADS  = None
+ENCODE_POOL_MIN_TEXTS = 2000
+
+# Mutation journal (see journal.py): every add/remove is one line, written
+# by a background thread that group-commits whatever is queued (waiting
+# JOURNAL_COALESCE_SECONDS for more) with one fsync. Past either threshold a
+# background compaction writes a new snapshot directory under SNAPSHOT_DIR.
+# Recommenders in other processes load the snapshot and replay the journal
+# entries after it, so they see edits on their next poll either way.
+# CSV_PATH seeds the first run; it, INDEX_PATH and META_DIR are re-exported
+# from each snapshot.
+JOURNAL_PATH             = "catalog_journal.jsonl"
+JOURNAL_FSYNC            = True
+JOURNAL_COALESCE_SECONDS = 0.005
+JOURNAL_COMPACT_OPS      = 500
+JOURNAL_COMPACT_BYTES    = 4 * 2**20
+SNAPSHOT_DIR             = "catalog_snapshots"
+
+# Catalog generation file / manifest: names the current snapshot directory,
+# bumped by the manager after each snapshot, polled (with the journal) by
+# recommenders in other processes
+GEN_PATH             = "catalog_generation.json"
+CATALOG_POLL_SECONDS = 2.0
+
+# Max number of query embeddings kept in BookRecommender's LRU cache
+QUERY_CACHE_SIZE = 1024
+
+# Max number of rendered result cards kept by BookRecommender
+CARD_CACHE_SIZE = 4096
+
+# Local ranking: "semantic" (FAISS only), "lexical" (BM25 only) or "hybrid"
+# (reciprocal rank fusion of both; see lexical.py). In hybrid mode the
+# reported similarity is the fused rank score, not a cosine.
+SEARCH_RANKING = os.getenv("SEARCH_RANKING", "semantic")
+
+# Answer ISBN and "quoted" queries from the BM25 index alone, skipping the
+# embedding model
+LEXICAL_FAST_PATH = True
+
+# Persistent cache of Google Books API responses (see api_cache.py)
+API_CACHE_PATH        = "google_books_cache.sqlite"
+API_CACHE_TTL         = 24 * 3600       # seconds an entry is served as fresh
+API_CACHE_STALE_TTL   = 7 * 24 * 3600   # extra seconds served stale while refreshing
+API_CACHE_MAX_ENTRIES = 50_000
+
+# Google Books paging: pages are fetched in parallel over a pooled session
+# (GOOGLE_BOOKS_URL can be pointed at a stub server, see benchmark.py)
+GOOGLE_BOOKS_URL      = os.getenv("GOOGLE_BOOKS_URL",
+                                  "https://www.googleapis.com/books/v1/volumes")
+GOOGLE_BOOKS_WORKERS  = 8
+EXTERNAL_DEADLINE     = 6.0     # seconds for all pages of one search
+
+# Per-branch budgets for recommend() when both branches run: local from
+# its submission (after the query is embedded), external from the start of
+# the request. A branch searched on its own is always waited for.
+LOCAL_TIMEOUT    = 2.0
+EXTERNAL_TIMEOUT = 8.0
+
+# Prometheus-style metrics endpoint started next to the Gradio app
+# (None disables it); see metrics.py. Bound to loopback only: scrape it
+# through a local agent or set METRICS_HOST deliberately. A second app on
+# the same box logs a warning and runs without it.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = 9100
+# Opt-in sampling profiler: keeps collapsed stacks + spans of the slowest
+# PROFILE_KEEP requests in PROFILE_DIR
+PROFILE_SLOW_REQUESTS = False
+PROFILE_DIR           = "slow_requests"
+PROFILE_KEEP          = 10
+PROFILE_INTERVAL      = 0.005     # seconds between stack samples
+
+# The apps serve their page at once and warm the engine in the background;
+# requests arriving before it is ready wait up to this long (see warmup.py)
+WARMUP_TIMEOUT = 300.0
 
 LOGO_PATH = r'static/logo.png'
 #LOGO_PATH = 'static/logo.png'
@@ -0,0 +1,149 @@
+# embedding_backends.py
+
+"""
+Embedding backends behind models.SharedEncoder and EncodingPool workers:
+- "torch": the SentenceTransformer model as published (the reference)
+- "int8":  the same model with its Linear layers dynamically quantized to
+  int8 (torch quantize_dynamic); CPU only
+- "onnx":  the model exported to an ONNX graph and run by onnxruntime
+  (sentence-transformers' onnx backend; needs optimum + onnxruntime)
+- Embeddings are cached per backend (cache_id), since the vectors differ
+- compare_backends: speed-up and cosine agreement of each backend against
+  the reference vectors, plus top-k neighbour overlap
+
+Run directly to compare backends on the current catalog:
+    python embedding_backends.py --backends torch int8 onnx --texts 2000
+
+Imports nothing from config, so encoding workers can load backends too.
+"""
+
+import time
+import logging
+import numpy as np
+from encoding_pool import l2_normalize
+
+logger = logging.getLogger(__name__)
+
+BACKENDS  = ("torch", "int8", "onnx")
+REFERENCE = "torch"
+
+
+def cache_id(model_name: str, backend: str) -> str:
+    """Name the backend's embeddings are cached under."""
+    return model_name if backend == REFERENCE else f"{model_name}@{backend}"
+
+
+def backend_device(backend: str, device: str) -> str:
+    # Dynamic int8 kernels only exist for CPU
+    return "cpu" if backend == "int8" else device
+
+
+def load_model(model_name: str, device: str, backend: str = REFERENCE):
+    """A SentenceTransformer (encode / get_sentence_embedding_dimension)
+    running on `backend`."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
+    from sentence_transformers import SentenceTransformer
+    if backend == "onnx":
+        return SentenceTransformer(model_name, device=device, backend="onnx")
+    model = SentenceTransformer(model_name, device=backend_device(backend, device))
+    if backend == "int8":
+        import torch
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+def model_bytes(model) -> int:
+    """Bytes held by the model's weights (quantized ones included)."""
+    if not hasattr(model, "state_dict"):
+        return 0
+    total = 0
+    stack = list(model.state_dict().values())
+    while stack:
+        value = stack.pop()
+        if isinstance(value, (tuple, list)):
+            stack.extend(value)          # packed quantized (weight, bias)
+        elif hasattr(value, "element_size"):
+            total += value.numel() * value.element_size()
+    return total
+
+
+def _topk_overlap(ref: np.ndarray, embs: np.ndarray, k: int, n_queries: int) -> float:
+    """Mean share of each query's reference top-k neighbours that the
+    backend's vectors also rank in their top-k."""
+    k = min(k, len(ref) - 1)
+    if k <= 0:
+        return 1.0
+    queries = np.arange(min(n_queries, len(ref)))
+
+    def top(vecs):
+        sims = vecs[queries].dot(vecs.T)
+        sims[queries, queries] = -np.inf       # a text is not its own neighbour
+        return np.argpartition(-sims, k, axis=1)[:, :k]
+
+    hits = [len(set(a) & set(b)) for a, b in zip(top(ref), top(embs))]
+    return float(np.mean(hits)) / k
+
+
+def compare_backends(texts, model_name: str, backends=BACKENDS, device: str = "cpu",
+                     batch_size: int = 64, k: int = 10, n_queries: int = 200) -> list:
+    """Encode `texts` with every backend and compare it with the reference."""
+    texts = list(texts)
+    order = [REFERENCE] + [b for b in backends if b != REFERENCE]
+    report, ref, ref_seconds = [], None, None
+    for backend in order:
+        try:
+            t0 = time.perf_counter()
+            model = load_model(model_name, device, backend)
+            load_s = time.perf_counter() - t0
+        except Exception as e:          # missing optional packages, no export, ...
+            logger.info("Skipping %s backend: %s", backend, e)
+            report.append({"backend": backend, "error": str(e)})
+            continue
+        model.encode(texts[:batch_size], batch_size=batch_size)      # warm-up pass
+        t0 = time.perf_counter()
+        embs = l2_normalize(model.encode(texts, batch_size=batch_size,
+                                         convert_to_numpy=True))
+        encode_s = time.perf_counter() - t0
+        if ref is None:
+            ref, ref_seconds = embs, encode_s
+        cos = np.sum(ref * embs, axis=1)
+        report.append({
+            "backend":          backend,
+            "load_seconds":     round(load_s, 3),
+            "encode_seconds":   round(encode_s, 3),
+            "texts_per_second": round(len(texts) / max(encode_s, 1e-9), 1),
+            "speedup":          round(ref_seconds / max(encode_s, 1e-9), 2),
+            "memory_mb":        round(model_bytes(model) / 2**20, 1),
+            "cosine_mean":      round(float(cos.mean()), 5),
+            "cosine_min":       round(float(cos.min()), 5),
+            "cosine_p01":       round(float(np.percentile(cos, 1)), 5),
+            f"top{k}_overlap":  round(_topk_overlap(ref, embs, k, n_queries), 4),
+        })
+        if backend == REFERENCE and REFERENCE not in backends:
+            report.pop()                # only needed as the baseline
+    return report
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+    import pandas as pd
+    from config import CSV_PATH, EMBED_MODEL
+
+    parser = argparse.ArgumentParser(description="Compare embedding backends on the catalog")
+    parser.add_argument("--backends",   nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--texts",      type=int, default=2000,
+                        help="catalog texts to encode (title + description)")
+    parser.add_argument("--device",     default="cpu")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--k",          type=int, default=10)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    df = pd.read_csv(CSV_PATH, nrows=args.texts).fillna("")
+    texts = (df["title"].astype(str) + ". " + df["description"].astype(str)).tolist()
+    for row in compare_backends(texts, EMBED_MODEL, args.backends, args.device,
+                                args.batch_size, args.k):
+        print(json.dumps(row))
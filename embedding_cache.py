@@ -0,0 +1,114 @@
+# embedding_cache.py
+
+"""
+EmbeddingCache:
+- Content-addressed on-disk store of text embeddings
+- Keys are a hash of (model name, embedded text)
+- Append-only: only texts never seen before are sent to the model
+- book_text: the text a book is embedded from (manager and recommenders
+  must agree on it)
+"""
+
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+
+
+def book_text(book: dict) -> str:
+    return f"{book.get('title', '')}. {book.get('description', '')}"
+
+
+class EmbeddingCache:
+    """Persistent embedding store so unchanged books are never re-encoded."""
+
+    def __init__(self, cache_dir: str, model_name: str):
+        self.model_name = model_name
+        self.cache_dir  = os.path.join(cache_dir, model_name.replace("/", "__"))
+        self.info_path  = os.path.join(self.cache_dir, "info.json")
+        self.keys_path  = os.path.join(self.cache_dir, "keys.txt")
+        self.vecs_path  = os.path.join(self.cache_dir, "vectors.f32")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.dim     = None
+        self.rows    = {}      # key -> row in vectors.f32
+        self.vectors = None
+        self._lock   = threading.Lock()
+        self._load()
+
+    def key(self, text: str) -> str:
+        h = hashlib.sha1()
+        h.update(self.model_name.encode("utf-8"))
+        h.update(b"\0")
+        h.update(text.encode("utf-8"))
+        return h.hexdigest()
+
+    def _load(self):
+        if not os.path.exists(self.info_path):
+            return
+        with open(self.info_path, "r") as f:
+            self.dim = json.load(f)["dim"]
+
+        keys = []
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "r") as f:
+                keys = [line.strip() for line in f if line.strip()]
+        row_bytes = self.dim * 4
+        vec_bytes = os.path.getsize(self.vecs_path) \
+                    if os.path.exists(self.vecs_path) else 0
+        n_vecs    = vec_bytes // row_bytes
+
+        # A crash between the two appends leaves them out of step; keep the
+        # common prefix and drop the torn tail.
+        n = min(len(keys), n_vecs)
+        if n != len(keys) or vec_bytes != n * row_bytes:
+            keys = keys[:n]
+            with open(self.keys_path, "w") as f:
+                f.writelines(k + "\n" for k in keys)
+            with open(self.vecs_path, "ab") as f:
+                f.truncate(n * row_bytes)
+
+        self.rows = {k: i for i, k in enumerate(keys)}
+        self._map(n)
+
+    def _map(self, n: int):
+        self.vectors = np.memmap(self.vecs_path, dtype=np.float32, mode="r",
+                                 shape=(n, self.dim)) if n else None
+
+    def _append(self, keys, embs: np.ndarray):
+        if self.dim is None:
+            self.dim = int(embs.shape[1])
+            with open(self.info_path, "w") as f:
+                json.dump({"model": self.model_name, "dim": self.dim}, f)
+        # Vectors first, keys second: keys are the commit point.
+        with open(self.vecs_path, "ab") as f:
+            f.write(np.ascontiguousarray(embs, dtype=np.float32).tobytes())
+        with open(self.keys_path, "a") as f:
+            f.writelines(k + "\n" for k in keys)
+        start = len(self.rows)
+        for i, k in enumerate(keys):
+            self.rows[k] = start + i
+        self._map(len(self.rows))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, text: str) -> bool:
+        return self.key(text) in self.rows
+
+    def encode(self, texts, encode_fn) -> np.ndarray:
+        """Return embeddings for `texts`, calling `encode_fn` only on misses."""
+        keys = [self.key(t) for t in texts]
+        with self._lock:
+            missing = {}
+            for k, t in zip(keys, texts):
+                if k not in self.rows and k not in missing:
+                    missing[k] = t
+            if missing:
+                embs = encode_fn(list(missing.values()))
+                self._append(list(missing.keys()), embs)
+            if not keys:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            return np.asarray(self.vectors[[self.rows[k] for k in keys]],
+                              dtype=np.float32)
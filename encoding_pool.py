@@ -0,0 +1,91 @@
+# encoding_pool.py
+
+"""
+Multi-process CPU encoding for index builds:
+- Spreads fixed-size batches of texts over N worker processes
+- Each worker loads the model (on the configured backend) once and pins
+  its torch thread count
+- Same L2-normalised float32 vectors as the serial SharedEncoder path
+- Reports throughput in texts per second
+
+Workers only import this module, so they start without config or an API key.
+"""
+
+import os
+import time
+import logging
+import multiprocessing as mp
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def l2_normalize(embs: np.ndarray) -> np.ndarray:
+    """Unit-length float32 rows; shared by the serial and pooled paths."""
+    norms = np.linalg.norm(embs, axis=1, keepdims=True)
+    return (embs / np.clip(norms, 1e-8, None)).astype(np.float32)
+
+
+_worker_model = None
+_worker_batch = None
+
+
+def _init_worker(model_name: str, torch_threads: int, batch_size: int, backend: str):
+    global _worker_model, _worker_batch
+    import torch
+    torch.set_num_threads(torch_threads)
+    from embedding_backends import load_model
+    _worker_model = load_model(model_name, "cpu", backend)
+    _worker_batch = batch_size
+
+
+def _encode_batch(texts):
+    embs = _worker_model.encode(texts, batch_size=_worker_batch, convert_to_numpy=True)
+    return l2_normalize(embs)
+
+
+class EncodingPool:
+    """Process pool that encodes texts batch-parallel on CPU."""
+
+    def __init__(self, model_name: str, workers: int, batch_size: int = 64,
+                 torch_threads: int = None, backend: str = "torch"):
+        self.workers       = workers
+        self.batch_size    = batch_size
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.texts         = 0
+        self.seconds       = 0.0
+        # spawn: torch and fork do not mix
+        self._pool = mp.get_context("spawn").Pool(
+            workers, initializer=_init_worker,
+            initargs=(model_name, self.torch_threads, batch_size, backend))
+
+    def encode(self, texts) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = [texts[i:i + self.batch_size]
+                   for i in range(0, len(texts), self.batch_size)]
+        t0 = time.perf_counter()
+        embs = np.vstack(self._pool.map(_encode_batch, batches, chunksize=1))
+        elapsed = time.perf_counter() - t0
+        self.texts   += len(texts)
+        self.seconds += elapsed
+        logger.info("Encoded %d texts in %.1fs (%.0f texts/s, %d workers x %d threads)",
+                    len(texts), elapsed, len(texts) / max(elapsed, 1e-9),
+                    self.workers, self.torch_threads)
+        return embs
+
+    @property
+    def throughput(self) -> float:
+        """Texts per second over every encode() so far."""
+        return self.texts / self.seconds if self.seconds else 0.0
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,81 @@
+# google_books.py
+
+"""
+GoogleBooksClient:
+- Fetches Google Books volume pages concurrently over a pooled keep-alive session
+- Serves pages through the persistent ResponseCache
+- Merges pages in order under an overall deadline
+"""
+
+import time
+import functools
+from concurrent.futures import ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from api_cache import ResponseCache
+
+PAGE_SIZE = 40      # Google Books maxResults limit
+
+
+class GoogleBooksClient:
+    """Pooled, cached, parallel pager for the volumes endpoint."""
+
+    def __init__(self, api_key: str, url: str, cache: ResponseCache,
+                 workers: int = 8, deadline: float = 6.0, page_timeout: float = 5.0):
+        self.api_key      = api_key
+        self.url          = url
+        self.cache        = cache
+        self.deadline     = deadline
+        self.page_timeout = page_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix="google-books")
+
+    def _fetch_page(self, params: dict, timeout: float) -> dict:
+        r = self.session.get(self.url, params=params, timeout=timeout)
+        r.raise_for_status()     # never cache error bodies
+        return r.json()
+
+    def _page(self, query, lang_code, start, batch, timeout):
+        params = {
+            "q":          query,
+            "maxResults": batch,
+            "startIndex": start,
+            "key":        self.api_key,
+            "orderBy":    "relevance",
+        }
+        if lang_code:
+            params["langRestrict"] = lang_code
+        key = ResponseCache.make_key(query, lang_code, start, batch)
+        return self.cache.fetch(
+            key, functools.partial(self._fetch_page, params, timeout))
+
+    def search(self, query: str, lang_code: str, pool_k: int) -> list:
+        """Return up to `pool_k` raw volume items, in relevance order."""
+        stop = time.monotonic() + self.deadline
+        pool_k = int(pool_k)
+        timeout = min(self.page_timeout, self.deadline)
+        pages = [(start, min(PAGE_SIZE, pool_k - start))
+                 for start in range(0, pool_k, PAGE_SIZE)]
+        futures = [self._pool.submit(self._page, query, lang_code, start, batch, timeout)
+                   for start, batch in pages]
+        wait(futures, timeout=max(0.0, stop - time.monotonic()))
+
+        # Same cut-off rules as sequential paging: stop at the first page
+        # that failed, missed the deadline, came back empty or came back short.
+        items = []
+        for (start, batch), fut in zip(pages, futures):
+            if not fut.done() or fut.exception() is not None:
+                break
+            page = fut.result().get("items", [])
+            if not page:
+                break
+            items += page
+            if len(page) < batch:
+                break
+        for fut in futures:
+            fut.cancel()
+        return items
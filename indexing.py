@@ -0,0 +1,336 @@
+# indexing.py
+
+"""
+FAISS index helpers:
+- Builds the inner-product index for the configured type
+  (exact flat, HNSW, IVF-Flat or IVF-PQ) and vector storage
+  (float32, float16 or 8-bit scalar quantized), training it when needed
+- Loads indexes memory-mapped so several workers share the page cache
+- LayeredIndex: the read-only view searchers get while the catalog is
+  edited (immutable base + small exact delta + tombstones)
+- Benchmarks recall@k against exact IndexFlatIP search and p50/p99 latency
+
+Run directly to compare index types on the current catalog:
+    python indexing.py --types flat hnsw ivf_flat ivf_pq --storage flat sq8
+"""
+
+import time
+import logging
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+IVF_TYPES   = ("ivf_flat", "ivf_pq")
+
+# storage mode -> index_factory component
+STORAGE_MODES = {
+    "flat": "Flat",      # 4 bytes / dim
+    "fp16": "SQfp16",    # 2 bytes / dim
+    "sq8":  "SQ8",       # 1 byte  / dim, needs training
+}
+
+DEFAULT_PARAMS = {
+    "hnsw_m":               32,
+    "hnsw_ef_construction": 200,
+    "hnsw_ef_search":       64,
+    "ivf_nlist":            1024,
+    "ivf_nprobe":           16,
+    "pq_m":                 48,       # must divide the embedding dim (384)
+    "pq_nbits":             8,
+    "train_size":           100_000,  # max vectors sampled for training
+}
+
+# IVF needs ~39 points per list to train well. Below MIN_TRAIN vectors no
+# quantizer (IVF, PQ, SQ8) is trained; an exact flat index stands in until
+# compaction has enough vectors to build the configured type.
+MIN_POINTS_PER_LIST = 39
+MIN_TRAIN           = 1000
+
+# Rows per block when streaming vectors into an index or an exact scan
+CHUNK_ROWS = 65536
+
+
+def factory_string(kind: str, storage: str, params: dict, n: int) -> str:
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {kind!r}; expected one of {INDEX_TYPES}")
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown index storage {storage!r}; "
+                         f"expected one of {sorted(STORAGE_MODES)}")
+    if kind == "flat":
+        return f"IDMap2,{STORAGE_MODES[storage]}"
+    if kind == "hnsw":
+        # HNSW can add but not delete; removed ids stay tombstoned until
+        # compaction rebuilds it from cached embeddings.
+        if storage == "fp16":
+            raise ValueError("fp16 storage is not available for HNSW; use flat or sq8")
+        suffix = "_SQ8" if storage == "sq8" else ""
+        return f"IDMap2,HNSW{params['hnsw_m']}{suffix}"
+    # IVF indexes take ids natively and remove by id without compaction,
+    # so they are not wrapped in IDMap2.
+    nlist = min(params["ivf_nlist"], max(1, n // MIN_POINTS_PER_LIST))
+    if kind == "ivf_flat":
+        return f"IVF{nlist},{STORAGE_MODES[storage]}"
+    return f"IVF{nlist},PQ{params['pq_m']}x{params['pq_nbits']}"
+
+
+def needs_training(kind: str, storage: str) -> bool:
+    return kind in IVF_TYPES or storage == "sq8"
+
+
+def _storage(index):
+    return faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+
+
+def set_search_params(index, params: dict = None):
+    """Apply query-time knobs (efSearch / nprobe); no-op for exact indexes."""
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    inner = _storage(index)
+    if hasattr(inner, "hnsw"):
+        inner.hnsw.efSearch = params["hnsw_ef_search"]
+    ivf = faiss.try_extract_index_ivf(inner)
+    if ivf is not None:
+        ivf.nprobe = params["ivf_nprobe"]
+
+
+def add_vectors(index, vectors: np.ndarray, ids: np.ndarray):
+    """Add with ids to an index that is already trained."""
+    if not len(vectors):
+        return
+    ids = np.asarray(ids, dtype=np.int64)
+    # Chunked so a memory-mapped matrix is never copied into RAM whole
+    for start in range(0, len(vectors), CHUNK_ROWS):
+        block = np.ascontiguousarray(vectors[start:start + CHUNK_ROWS], dtype=np.float32)
+        index.add_with_ids(block, ids[start:start + CHUNK_ROWS])
+
+
+def build_index(dim: int, vectors: np.ndarray, ids: np.ndarray,
+                kind: str = "flat", storage: str = "flat", params: dict = None):
+    """Create, train and fill an index of the requested type."""
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    n = len(vectors)
+    if needs_training(kind, storage) and n < MIN_TRAIN:
+        logger.warning("Only %d vectors; too few to train %s/%s, using flat",
+                       n, kind, storage)
+        kind, storage = "flat", "flat"
+
+    index = faiss.index_factory(dim, factory_string(kind, storage, params, n),
+                                faiss.METRIC_INNER_PRODUCT)
+    inner = _storage(index)
+    if hasattr(inner, "hnsw"):
+        inner.hnsw.efConstruction = params["hnsw_ef_construction"]
+    if not index.is_trained and n:
+        sample = vectors
+        if n > params["train_size"]:
+            rng = np.random.default_rng(0)
+            sample = vectors[np.sort(rng.choice(n, size=params["train_size"], replace=False))]
+        index.train(np.ascontiguousarray(sample, dtype=np.float32))
+    add_vectors(index, vectors, ids)
+    set_search_params(index, params)
+    return index
+
+
+def load_index(path: str, mmap: bool = False, params: dict = None):
+    """Read an index; with `mmap` the vector codes stay in the page cache."""
+    if not mmap:
+        index = faiss.read_index(path)
+    else:
+        # IO_FLAG_MMAP_IFC (faiss >= 1.10) maps flat/SQ codes; older builds
+        # only map IVF lists and read flat codes into RAM. IVF indexes reject
+        # it combined with IO_FLAG_MMAP ("mmap only supported for File
+        # objects") and map their lists with IO_FLAG_MMAP alone.
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        ifc = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        try:
+            index = faiss.read_index(path, flags | ifc)
+        except RuntimeError:
+            if not ifc:
+                raise
+            index = faiss.read_index(path, flags)
+    set_search_params(index, params)
+    return index
+
+
+class LayeredIndex:
+    """Immutable search view: a base index that is never mutated once
+    published, plus vectors added since it was built (searched exactly) and
+    tombstoned base ids removed since.
+
+    Edits return a new view sharing the base, so readers never wait on a
+    writer; `compacted` folds delta and tombstones into a fresh base.
+    """
+
+    def __init__(self, base, delta: np.ndarray = None, delta_ids: np.ndarray = None,
+                 dead=frozenset()):
+        self.base      = base
+        self.d         = base.d
+        self.delta     = np.zeros((0, base.d), dtype=np.float32) if delta is None else delta
+        self.delta_ids = np.zeros(0, dtype=np.int64) if delta_ids is None else delta_ids
+        self.dead      = frozenset(dead)
+        self._dead     = np.array(sorted(self.dead), dtype=np.int64)
+
+    @property
+    def ntotal(self) -> int:
+        return self.base.ntotal - len(self.dead) + len(self.delta_ids)
+
+    def add(self, vectors: np.ndarray, ids) -> "LayeredIndex":
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.d)
+        return LayeredIndex(self.base, np.vstack([self.delta, vectors]),
+                            np.concatenate([self.delta_ids,
+                                            np.asarray(ids, dtype=np.int64)]),
+                            self.dead)
+
+    def remove(self, ids) -> "LayeredIndex":
+        """Drop ids from the delta; tombstone the ones in the base."""
+        ids = np.asarray(ids, dtype=np.int64)
+        in_delta = np.isin(self.delta_ids, ids)
+        base_ids = set(ids.tolist()) - set(self.delta_ids[in_delta].tolist())
+        return LayeredIndex(self.base, self.delta[~in_delta], self.delta_ids[~in_delta],
+                            self.dead | base_ids)
+
+    def search(self, queries: np.ndarray, k: int):
+        """Same contract as faiss `index.search`: (D, I), I padded with -1."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, self.d)
+        nq = len(queries)
+        D = np.zeros((nq, 0), dtype=np.float32)
+        I = np.zeros((nq, 0), dtype=np.int64)
+        if self.base.ntotal:
+            D, I = self.base.search(queries, k + len(self._dead))
+            if len(self._dead):
+                I = np.where(np.isin(I, self._dead), -1, I)
+        if len(self.delta_ids):
+            D = np.hstack([D, queries @ self.delta.T])
+            I = np.hstack([I, np.broadcast_to(self.delta_ids, (nq, len(self.delta_ids)))])
+        if I.shape[1] < k:
+            D = np.hstack([D, np.full((nq, k - I.shape[1]), -np.inf, dtype=np.float32)])
+            I = np.hstack([I, np.full((nq, k - I.shape[1]), -1, dtype=np.int64)])
+        D = np.where(I >= 0, D, -np.inf).astype(np.float32)
+        order = np.argsort(-D, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+    def compacted(self, rebuild, trainable: bool = False):
+        """A plain index equal to this view, built on a copy of the base.
+        Indexes that cannot delete by id (HNSW) are rebuilt by `rebuild()`,
+        as is a base too small to have trained a `trainable` index type (the
+        exact stand-in) once the view holds enough vectors to train it."""
+        if len(self._dead) and not _removable(self.base) \
+                or trainable and self.base.ntotal < MIN_TRAIN <= self.ntotal:
+            return rebuild()
+        index = faiss.clone_index(self.base)
+        if len(self._dead):
+            index.remove_ids(self._dead)
+        add_vectors(index, self.delta, self.delta_ids)
+        return index
+
+    def rebase(self, base, folded: "LayeredIndex") -> "LayeredIndex":
+        """This view over `base`, the compaction of the earlier view `folded`:
+        edits made after `folded` stay in the delta / tombstones."""
+        keep = ~np.isin(self.delta_ids, folded.delta_ids)
+        dropped = set(folded.delta_ids.tolist()) - set(self.delta_ids.tolist())
+        return LayeredIndex(base, self.delta[keep], self.delta_ids[keep],
+                            (self.dead - folded.dead) | dropped)
+
+
+def _removable(index) -> bool:
+    return not hasattr(_storage(index), "hnsw")
+
+
+def code_bytes(index) -> int:
+    return int(getattr(_storage(index), "code_size", 4 * index.d)) * index.ntotal
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Row positions of the exact inner-product top-k, scanning `vectors` in blocks."""
+    best_s = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_i = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(vectors), CHUNK_ROWS):
+        block  = np.asarray(vectors[start:start + CHUNK_ROWS], dtype=np.float32)
+        scores = np.hstack([best_s, queries @ block.T])
+        pos    = np.hstack([best_i, np.broadcast_to(
+                     np.arange(start, start + len(block)), (len(queries), len(block)))])
+        kk   = min(k, scores.shape[1])
+        keep = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        best_s = np.take_along_axis(scores, keep, axis=1)
+        best_i = np.take_along_axis(pos, keep, axis=1)
+    return best_i
+
+
+def recall_at_k(index, vectors: np.ndarray, ids: np.ndarray,
+                queries: np.ndarray, k: int = 10) -> float:
+    """Overlap of `index`'s top-k with exact top-k over `vectors`."""
+    truth  = np.asarray(ids)[exact_top_k(vectors, queries, k)]
+    _, got = index.search(queries, k)
+    hits  = sum(len(set(t) & set(g[g >= 0])) for t, g in zip(truth, got))
+    return hits / truth.size if truth.size else 1.0
+
+
+def benchmark_index(index, vectors: np.ndarray, ids: np.ndarray,
+                    k: int = 10, n_queries: int = 200, seed: int = 0) -> dict:
+    """recall@k vs exact search plus single-query p50/p99 latency in ms."""
+    if not len(vectors):
+        return {}
+    rng = np.random.default_rng(seed)
+    sample  = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = np.ascontiguousarray(vectors[sample], dtype=np.float32)
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return {
+        f"recall@{k}": round(recall_at_k(index, vectors, ids, queries, k), 4),
+        "p50_ms":      round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms":      round(float(np.percentile(latencies, 99)), 3),
+        "code_bytes":  code_bytes(index),
+    }
+
+
+def compare_indexes(vectors: np.ndarray, ids: np.ndarray, types, storages,
+                    params: dict = None, k: int = 10, n_queries: int = 200) -> list:
+    """Build every (type, storage) combination and benchmark it."""
+    report = []
+    for kind in types:
+        for storage in storages:
+            try:
+                t0 = time.perf_counter()
+                index = build_index(vectors.shape[1], vectors, ids, kind, storage, params)
+                build_s = time.perf_counter() - t0
+            except ValueError as e:
+                logger.info("Skipping %s/%s: %s", kind, storage, e)
+                continue
+            report.append({
+                "type":          kind,
+                "storage":       storage,
+                "build_seconds": round(build_s, 3),
+                **benchmark_index(index, vectors, ids, k, n_queries),
+            })
+    return report
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+    import pandas as pd
+    from config import CSV_PATH, EMB_CACHE_DIR, INDEX_PARAMS
+    from embedding_cache import EmbeddingCache
+    from models import get_encoder
+
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types on the catalog")
+    parser.add_argument("--types",   nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--storage", nargs="+", default=["flat"], choices=list(STORAGE_MODES))
+    parser.add_argument("--k",       type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # Exact vectors come from the embedding cache, not from a (possibly lossy) index
+    df = pd.read_csv(CSV_PATH).fillna("")
+    texts = (df["title"].astype(str) + ". " + df["description"].astype(str)).tolist()
+    encoder = get_encoder()
+    vecs = EmbeddingCache(EMB_CACHE_DIR, encoder.cache_id).encode(texts, encoder.encode)
+    ids = df["book_id"].to_numpy(dtype=np.int64) if "book_id" in df.columns \
+          else np.arange(len(df), dtype=np.int64)
+    for row in compare_indexes(vecs, ids, args.types, args.storage,
+                               INDEX_PARAMS, args.k, args.queries):
+        print(json.dumps(row))
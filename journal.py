@@ -0,0 +1,207 @@
+# journal.py
+
+"""
+Append-only mutation journal for the catalog:
+- One JSON line per add/remove, numbered with a monotonically increasing seq
+- Appends are a few hundred bytes; JournalWriter does them on a background
+  thread and group-commits back-to-back mutations with a single fsync
+- Replayed at startup on top of the last snapshot (entries after its seq);
+  recommenders in other processes tail it with read_journal()
+- Compaction drops entries already folded into a snapshot; entries
+  appended while the snapshot was being written are kept, behind a
+  checkpoint line so seq numbering survives restarts
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from catalog import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(obj):
+    # numpy scalars from DataFrames
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+
+def read_journal(path: str, after_seq: int = 0):
+    """Mutation entries with seq > `after_seq` from a journal another
+    process is writing; a line still being appended is left for next time."""
+    try:
+        with open(path, "rb") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+    entries = []
+    for line in lines:
+        if not line.endswith(b"\n"):
+            break
+        entry = json.loads(line)
+        if entry["seq"] > after_seq and entry["op"] != "checkpoint":
+            entries.append(entry)
+    return entries
+
+
+class Journal:
+    """JSONL journal; `append` returns the entry's seq."""
+
+    def __init__(self, path: str, fsync: bool = True, min_seq: int = 0):
+        self.path     = path
+        self.fsync    = fsync
+        self.last_seq = 0
+        self.entries  = 0
+        self.bytes    = 0
+        self._lock    = threading.Lock()
+        self._load()
+        # Never reuse seqs a snapshot already claims, even if the file was lost
+        self.last_seq = max(self.last_seq, min_seq)
+        self._f = open(self.path, "ab")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                good += len(line)
+                self.last_seq = max(self.last_seq, entry["seq"])
+                self.entries += entry["op"] != "checkpoint"
+        if good < os.path.getsize(self.path):
+            # Torn tail from a crash mid-append: that mutation never returned
+            logger.warning("Dropping torn tail of %s", self.path)
+            with open(self.path, "ab") as f:
+                f.truncate(good)
+        self.bytes = good
+
+    def __len__(self):
+        return self.entries
+
+    def replay(self, after_seq: int = 0):
+        """Yield mutation entries with seq > `after_seq`, in order."""
+        with self._lock:
+            self._f.flush()
+            with open(self.path, "rb") as f:
+                lines = f.readlines()
+        for line in lines:
+            entry = json.loads(line)
+            if entry["seq"] > after_seq and entry["op"] != "checkpoint":
+                yield entry
+
+    def append(self, entry: dict) -> int:
+        return self.append_many([entry])
+
+    def append_many(self, entries: list) -> int:
+        """Write `entries` in order with one flush/fsync; returns the last seq."""
+        with self._lock:
+            seq, lines = self.last_seq, []
+            for entry in entries:
+                seq += 1
+                lines.append(json.dumps({"seq": seq, **entry}, separators=(",", ":"),
+                                        default=_json_default).encode("utf-8") + b"\n")
+            data = b"".join(lines)
+            self._f.write(data)
+            self._f.flush()
+            if self.fsync:
+                os.fsync(self._f.fileno())
+            self.last_seq = seq
+            self.entries += len(entries)
+            self.bytes   += len(data)
+            return seq
+
+    def truncate_through(self, seq: int):
+        """Drop entries with seq <= `seq` (they are in a snapshot now)."""
+        with self._lock:
+            self._f.flush()
+            with open(self.path, "rb") as f:
+                keep = [line for line in f if json.loads(line)["seq"] > seq]
+            checkpoint = json.dumps({"seq": seq, "op": "checkpoint"}).encode("utf-8") + b"\n"
+
+            def write(tmp):
+                with open(tmp, "wb") as out:
+                    out.write(checkpoint)
+                    out.writelines(keep)
+                    out.flush()
+                    os.fsync(out.fileno())
+            self._f.close()
+            atomic_write(self.path, write)
+            self._f = open(self.path, "ab")
+            self.entries = len(keep)
+            self.bytes   = len(checkpoint) + sum(len(line) for line in keep)
+
+    def close(self):
+        with self._lock:
+            self._f.close()
+
+
+class JournalWriter(threading.Thread):
+    """Background appender: `submit` returns at once; queued entries are
+    written in submission order, everything pending sharing one fsync."""
+
+    def __init__(self, journal: Journal, coalesce: float = 0.0, on_flush=None):
+        super().__init__(daemon=True, name="journal-writer")
+        self.journal   = journal
+        self.coalesce  = coalesce       # seconds to wait for more entries
+        self.on_flush  = on_flush       # called after each group commit
+        self.submitted = 0
+        self.written   = 0
+        self.error     = None
+        self._queue    = queue.Queue()
+        self._done     = threading.Condition()
+
+    def submit(self, entry: dict):
+        with self._done:
+            self.submitted += 1
+        self._queue.put(entry)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything submitted so far is durable; raises the
+        last write error if the journal cannot be written."""
+        with self._done:
+            target = self.submitted
+            ok = self._done.wait_for(
+                lambda: self.written >= target or self.error is not None, timeout)
+            if self.written < target and self.error is not None:
+                raise self.error
+            return ok
+
+    def run(self):
+        pending = []
+        while True:
+            if not pending:
+                pending.append(self._queue.get())
+                if self.coalesce:
+                    time.sleep(self.coalesce)
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.journal.append_many(pending)
+            except Exception as e:
+                # Keep the batch and retry; mutations stay in memory meanwhile
+                logger.exception("Journal write failed; %d mutations pending", len(pending))
+                with self._done:
+                    self.error = e
+                    self._done.notify_all()
+                time.sleep(1.0)
+                continue
+            with self._done:
+                self.written += len(pending)
+                self.error = None
+                self._done.notify_all()
+            pending = []
+            if self.on_flush is not None:
+                self.on_flush()
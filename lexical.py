@@ -0,0 +1,184 @@
+# lexical.py
+
+"""
+Lexical search over the catalog:
+- BM25 inverted index over title, subtitle, authors, categories and
+  description (title/authors weighted up), plus exact ISBN tokens
+- Updated by the manager on every add/remove while recommenders search it:
+  touched posting dicts are replaced rather than edited, so a reader never
+  iterates a dict that is changing under it
+- Reciprocal rank fusion of lexical and dense rankings
+- Query classification: ISBNs and quoted queries take the lexical-only path
+  and skip the transformer forward pass
+"""
+
+import re
+import math
+import heapq
+from collections import Counter
+from book_lookup import normalize_isbn13, normalize_isbn10
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# field -> repeat count (a crude BM25F field boost)
+FIELD_WEIGHTS = {
+    "title":       2,
+    "subtitle":    1,
+    "authors":     2,
+    "categories":  1,
+    "description": 1,
+}
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in into is it its of on or
+that the their this to was were will with about books book
+""".split())
+
+RRF_K = 60
+
+
+def tokenize(text) -> list:
+    return [t for t in TOKEN_RE.findall(str(text or "").casefold())
+            if t not in STOPWORDS]
+
+
+def isbn_digits(text) -> str:
+    """Digits (and X) of `text` if it is a 10- or 13-character ISBN, else ""."""
+    s = str(text or "").strip().upper()
+    if s.startswith("ISBN"):
+        s = s[4:].lstrip(": ")
+    if not s or any(c not in "0123456789X- " for c in s):
+        return ""
+    digits = s.replace("-", "").replace(" ", "")
+    return digits if len(digits) in (10, 13) else ""
+
+
+def _isbn_tokens(book: dict) -> list:
+    keys = (normalize_isbn13(book.get("isbn13")), normalize_isbn10(book.get("isbn10")))
+    return [f"isbn:{key}" for key in keys if key]
+
+
+def classify_query(query: str):
+    """("isbn", token) | ("keyword", terms) | ("semantic", None).
+
+    ISBNs and "quoted" queries are exact lookups: the lexical index answers
+    them without running the embedding model.
+    """
+    digits = isbn_digits(query)
+    if digits:
+        return "isbn", f"isbn:{digits}"
+    q = (query or "").strip()
+    if len(q) > 2 and q[0] == q[-1] and q[0] in "\"'":
+        return "keyword", tokenize(q[1:-1])
+    return "semantic", None
+
+
+class LexicalIndex:
+    """BM25 over book records keyed by book_id.
+
+    Mutations replace the posting dict of every touched term instead of
+    editing it; searches running concurrently see either version.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b  = b
+        self.postings  = {}     # term -> {book_id: tf}
+        self.doc_len   = {}     # book_id -> weighted token count
+        self.total_len = 0
+
+    @classmethod
+    def build(cls, items) -> "LexicalIndex":
+        """From (book_id, record) pairs."""
+        index = cls()
+        postings = {}
+        for book_id, book in items:
+            tf = index._terms(book)
+            index.doc_len[int(book_id)] = sum(tf.values())
+            index.total_len += index.doc_len[int(book_id)]
+            for term, n in tf.items():
+                postings.setdefault(term, {})[int(book_id)] = n
+        index.postings = postings
+        return index
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    @staticmethod
+    def _terms(book: dict) -> Counter:
+        tf = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(book.get(field)):
+                tf[token] += weight
+        for token in _isbn_tokens(book):
+            tf[token] += 1
+        return tf
+
+    def add(self, book_id: int, book: dict):
+        book_id = int(book_id)
+        if book_id in self.doc_len:
+            self.remove(book_id, book)
+        tf = self._terms(book)
+        self.doc_len[book_id] = sum(tf.values())
+        self.total_len += self.doc_len[book_id]
+        for term, n in tf.items():
+            posting = dict(self.postings.get(term, ()))
+            posting[book_id] = n
+            self.postings[term] = posting
+
+    def remove(self, book_id: int, book: dict):
+        book_id = int(book_id)
+        if book_id not in self.doc_len:
+            return
+        for term in self._terms(book):
+            posting = self.postings.get(term)
+            if posting is None or book_id not in posting:
+                continue
+            posting = dict(posting)
+            del posting[book_id]
+            if posting:
+                self.postings[term] = posting
+            else:
+                del self.postings[term]
+        self.total_len -= self.doc_len.pop(book_id)
+
+    def exact(self, token: str) -> list:
+        """Ids whose document contains `token` (e.g. "isbn:978..."), sorted."""
+        return sorted(self.postings.get(token, ()))
+
+    def search(self, terms, k: int) -> list:
+        """Top-k (book_id, bm25 score) for a token list, best first."""
+        n = len(self.doc_len)
+        if not n or not terms:
+            return []
+        avg_len = self.total_len / n
+        scores = {}
+        for term in set(terms):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for book_id, tf in posting.items():
+                # A book removed mid-search scores with the average length
+                dl = self.doc_len.get(book_id, avg_len)
+                norm = tf + self.k1 * (1 - self.b + self.b * dl / avg_len)
+                scores[book_id] = scores.get(book_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+
+
+def rrf_fuse(rankings, k: int, rrf_k: int = RRF_K) -> list:
+    """Reciprocal rank fusion of several best-first id lists.
+
+    Returns the top-k (book_id, score), scores scaled so a document ranked
+    first everywhere scores 1.0.
+    """
+    rankings = [list(r) for r in rankings if r]
+    if not rankings:
+        return []
+    scores = {}
+    for ranking in rankings:
+        for rank, book_id in enumerate(ranking):
+            scores[book_id] = scores.get(book_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    best = len(rankings) / (rrf_k + 1)
+    return [(book_id, s / best)
+            for book_id, s in heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])]
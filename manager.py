@@ -4,19 +4,48 @@
 DynamicBookManager:
 - Loads library data from CSV
 - Builds / rebuilds a FAISS index on title+description embeddings
-- Adds & removes books (persisting CSV, pickles, FAISS)
+- Reuses cached embeddings so only new or edited books are encoded; the
+  model runs on the configured embedding backend (see embedding_backends.py)
+- Adds & removes books incrementally by stable book_id; handlers return
+  once memory is updated, a background writer journals the change
+  (group commit), and compaction folds the journal into a new snapshot
+  directory (CSV, columnar metadata, FAISS) committed by the manifest
+- Bulk-adds many books with one batched encode and one journal entry
+- Hash indexes on title / ISBN for O(1) removal and duplicate checks
+- BM25 lexical index kept in step with the FAISS index (hybrid search)
+- Publishes a new catalog generation after every change without making
+  searches wait: adds go to a small exact-search delta and removals are
+  tombstones over an immutable base index (see indexing.LayeredIndex);
+  compaction folds both into a fresh base
+- Times mutations and their stages into metrics histograms
 """
 
 import os
-import pickle
+import atexit
+import shutil
+import logging
+import threading
 import pandas as pd
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
-from config import CSV_PATH, INDEX_PATH, META_PATH
+from config import (CSV_PATH, INDEX_PATH, META_DIR, GEN_PATH, SNAPSHOT_DIR, JOURNAL_PATH, JOURNAL_FSYNC,
+                    JOURNAL_COALESCE_SECONDS, JOURNAL_COMPACT_OPS, JOURNAL_COMPACT_BYTES,
+                    EMBED_MODEL, EMBED_BACKEND, EMB_CACHE_DIR, ENCODE_WORKERS, ENCODE_BATCH_SIZE,
+                    ENCODE_TORCH_THREADS, ENCODE_POOL_MIN_TEXTS, INDEX_TYPE, INDEX_STORAGE,
+                    INDEX_PARAMS, INDEX_BENCH_QUERIES)
+from embedding_cache import EmbeddingCache, book_text
+from catalog import (Catalog, SNAPSHOT_FILES, atomic_write, read_generation,
+                     write_generation, write_snapshot, snapshot_path, gc_snapshots)
+from journal import Journal, JournalWriter
+from book_lookup import BookLookup
+from lexical import LexicalIndex
+from models import get_encoder
+from encoding_pool import EncodingPool
+from metastore import write_columnar, swap_dir
+from indexing import build_index, benchmark_index, needs_training, LayeredIndex
+import metrics
 
-import torch
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+logger = logging.getLogger(__name__)
 
 
 class DynamicBookManager:
@@ -26,61 +55,328 @@ class DynamicBookManager:
         # Ensure data directory exists
         os.makedirs(os.path.dirname(CSV_PATH), exist_ok=True)
 
-        # Load embedding model
-        self.model = SentenceTransformer("all-MiniLM-L6-v2", device=DEVICE)
-        # Initialize data structures
-        self.df = None
-        self.metadata = []
+        # Shared embedding model (loaded once per process)
+        self.model = get_encoder(EMBED_MODEL, backend=EMBED_BACKEND)
+        self.cache = EmbeddingCache(EMB_CACHE_DIR, self.model.cache_id)
+        # Initialize data structures (metadata and index keyed by book_id;
+        # the CSV frame is only built when a snapshot is written)
+        self.columns = []
+        self.metadata = {}
         self.index = None
+        self.lookup = BookLookup()
+        self.lexical = LexicalIndex()
+        self._next_id = 0
+        # Snapshots for recommenders; continue numbering from the last
+        # generation on disk so watchers in other processes see it advance
+        last = read_generation(GEN_PATH) or {}
+        self.catalog = Catalog(generation=last.get("generation", 0))
+        # Mutations since the last snapshot; serialised by _lock
+        self.journal = Journal(JOURNAL_PATH, fsync=JOURNAL_FSYNC,
+                               min_seq=last.get("journal_seq", 0))
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compact_wanted = threading.Event()
+        self.writer = JournalWriter(self.journal, JOURNAL_COALESCE_SECONDS,
+                                    on_flush=self._maybe_compact)
 
         # Load or build artifacts
-        self._load_or_build()
+        with metrics.request("startup"):
+            self._load_or_build(last)
+        self.writer.start()
+        threading.Thread(target=self._compactor, daemon=True,
+                         name="journal-compactor").start()
+        atexit.register(self.flush)
 
-    def _load_or_build(self):
+    def _load_or_build(self, last: dict):
         # If CSV missing, create empty
         if not os.path.exists(CSV_PATH):
             pd.DataFrame(columns=[
-                "isbn13","isbn10","title","subtitle","authors","categories",
+                "book_id","isbn13","isbn10","title","subtitle","authors","categories",
                 "thumbnail","description","published_year","average_rating",
                 "num_pages","ratings_count"
             ]).to_csv(CSV_PATH, index=False)
 
-        # Read CSV
-        self.df = pd.read_csv(CSV_PATH).fillna("")
-        self.metadata = self.df.to_dict(orient="records")
+        # Read the manifest's CSV snapshot (CSV_PATH seeds the first run),
+        # then replay journaled changes made after it
+        source = snapshot_path(last, "csv") if last.get("snapshot") else CSV_PATH
+        df = self._assign_ids(pd.read_csv(source).fillna(""))
+        self.columns = list(df.columns)
+        self.metadata = dict(zip(df.index.tolist(), df.to_dict(orient="records")))
+        self._next_id = max(self._next_id, last.get("next_id", 0))
+        replayed = self._replay(last.get("journal_seq", 0) if last.get("complete") else 0)
+        self.lookup = BookLookup.build(self.metadata.items())
+        with metrics.span("lexical_build"):
+            self.lexical = LexicalIndex.build(self.metadata.items())
 
-        # Build embeddings + index
-        texts = (self.df["title"] + ". " + self.df["description"]).tolist()
-        embs = self.model.encode(texts, convert_to_numpy=True)
-        norms = np.linalg.norm(embs, axis=1, keepdims=True)
-        embs = (embs / np.clip(norms, 1e-8, None)).astype(np.float32)
+        # Build embeddings (cache misses only) + index
+        embs, ids = self._build_index()
+        if (INDEX_TYPE, INDEX_STORAGE) != ("flat", "flat") and INDEX_BENCH_QUERIES:
+            logger.info("Index %s/%s over %d books: %s", INDEX_TYPE, INDEX_STORAGE,
+                        len(ids), benchmark_index(self.index.base, embs, ids,
+                                                  n_queries=INDEX_BENCH_QUERIES))
 
-        dim = embs.shape[1]
-        index = faiss.IndexFlatIP(dim)
-        if len(embs):
-            index.add(embs)
-        self.index = index
+        # Publish + persist index & metadata for recommender. Unchanged since
+        # the manifest's snapshot: keep its generation and files, so neither
+        # a rewrite nor a reload in other processes follows every restart.
+        if last.get("snapshot") and last.get("complete") and not replayed \
+                and last.get("embedding") == self.model.cache_id \
+                and last.get("index") == self._index_kind():
+            self._publish(generation=last["generation"])
+        else:
+            self._publish()
+            self.compact()
 
-        # Persist index & metadata for recommender
-        self._save_meta()
+    @staticmethod
+    def _index_kind() -> str:
+        return f"{INDEX_TYPE}/{INDEX_STORAGE}"
 
-    def _save_meta(self):
-        self.df.to_csv(CSV_PATH, index=False)
-        with open(META_PATH, "wb") as f:
-            pickle.dump(self.metadata, f)
-        faiss.write_index(self.index, INDEX_PATH)
+    def _replay(self, after_seq: int):
+        # Idempotent per entry (adds skip known ids), so replaying entries
+        # already in the snapshot after a crash mid-compaction is harmless.
+        n = 0
+        for entry in self.journal.replay(after_seq):
+            if entry["op"] == "add":
+                for book in entry["books"]:
+                    if book["book_id"] not in self.metadata:
+                        self.metadata[book["book_id"]] = {
+                            **dict.fromkeys(self.columns, ""), **book}
+                if entry["books"]:
+                    self._next_id = max(self._next_id,
+                                        max(b["book_id"] for b in entry["books"]) + 1)
+            elif entry["op"] == "remove":
+                for book_id in entry["ids"]:
+                    self.metadata.pop(book_id, None)
+            n += 1
+        if n:
+            logger.info("Replayed %d journal entries after seq %d", n, after_seq)
+        return n
+
+    def _build_index(self):
+        index, embs, ids = self._index_records(list(self.metadata.values()))
+        self.index = LayeredIndex(index)
+        return embs, ids
+
+    def _index_records(self, records: list):
+        """(index, embeddings, ids) over `records`, embeddings from the cache
+        (also used at compaction by index types that cannot delete by id)."""
+        with metrics.span("encode"):
+            embs = self.cache.encode([self._book_text(r) for r in records],
+                                     self._encode_bulk)
+        ids = np.array([r["book_id"] for r in records], dtype=np.int64)
+        with metrics.span("index_build"):
+            index = build_index(self.model.dim, embs, ids,
+                                INDEX_TYPE, INDEX_STORAGE, INDEX_PARAMS)
+        return index, embs, ids
+
+    def _frame(self, records: list):
+        """The catalog as a DataFrame (CSV column order, then any extra keys)."""
+        columns = list(dict.fromkeys(self.columns + [c for r in records for c in r]))
+        return pd.DataFrame.from_records(records, columns=columns).fillna("")
+
+    def _assign_ids(self, df):
+        # Stable surrogate key: keep existing ids, number new/duplicate rows
+        # after the current maximum so ids are never reused.
+        if "book_id" not in df.columns:
+            df.insert(0, "book_id", "")
+        ids = pd.to_numeric(df["book_id"], errors="coerce")
+        self._next_id = int(ids.max()) + 1 if ids.notna().any() else 0
+        fresh = ids.isna() | ids.duplicated()
+        ids[fresh] = range(self._next_id, self._next_id + int(fresh.sum()))
+        self._next_id += int(fresh.sum())
+        df["book_id"] = ids.astype(np.int64)
+        return df.set_index("book_id", drop=False)
+
+    @staticmethod
+    def _book_text(book: dict) -> str:
+        return book_text(book)
+
+    def _encode_bulk(self, texts):
+        # Large cold builds on CPU: fan batches out to worker processes
+        if ENCODE_WORKERS <= 1 or len(texts) < ENCODE_POOL_MIN_TEXTS \
+                or self.model.device != "cpu":
+            return self.model.encode(texts, batch_size=ENCODE_BATCH_SIZE)
+        with EncodingPool(EMBED_MODEL, ENCODE_WORKERS, ENCODE_BATCH_SIZE,
+                          ENCODE_TORCH_THREADS, self.model.backend) as pool:
+            return pool.encode(texts)
+
+    def _publish(self, generation: int = None):
+        # self.index is an immutable view; metadata / lexical are shared and
+        # updated so that concurrent readers see either side of an edit
+        return self.catalog.publish(self.index, self.metadata,
+                                    generation=generation, lexical=self.lexical)
+
+    def _commit(self, entry: dict):
+        """Queue one (already published) mutation for the journal; no disk I/O here."""
+        self.writer.submit(entry)
+
+    def _maybe_compact(self):
+        # Runs on the writer thread after each group commit
+        if len(self.journal) >= JOURNAL_COMPACT_OPS \
+                or self.journal.bytes >= JOURNAL_COMPACT_BYTES:
+            self._compact_wanted.set()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every mutation so far is in the journal on disk."""
+        return self.writer.flush(timeout)
+
+    def _compactor(self):
+        # Only the ops / bytes thresholds trigger a snapshot; recommenders in
+        # other processes replay the journal tail meanwhile (CatalogWatcher)
+        while True:
+            self._compact_wanted.wait()
+            self._compact_wanted.clear()
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("Journal compaction failed; will retry on next change")
+
+    def compact(self):
+        """Fold the journal into fresh snapshot files now."""
+        with self._compact_lock:
+            # Captured together under the lock (mutations wait, readers do
+            # not). The record list and the immutable index view let edits
+            # go on while the files are written.
+            with self._lock:
+                self.writer.flush()     # journal seq must match the snapshot
+                generation = self.catalog.current().generation
+                prev = read_generation(GEN_PATH) or {}
+                if prev.get("snapshot") and prev.get("generation") == generation \
+                        and prev.get("journal_seq") == self.journal.last_seq:
+                    return              # already on disk
+                with metrics.span("snapshot_copy"):
+                    records = list(self.metadata.values())
+                view = self.index
+                seq, next_id = self.journal.last_seq, self._next_id
+            # Fold the delta and tombstones into a new base on a copy
+            with metrics.span("index_compact"):
+                index = view.compacted(lambda: self._index_records(records)[0],
+                                       needs_training(INDEX_TYPE, INDEX_STORAGE))
+            with metrics.span("persist"):
+                self._save_meta(generation, index, records, seq, next_id)
+                self.journal.truncate_through(seq)
+            # Swap the compacted base in under edits made meanwhile
+            with self._lock:
+                self.index = self.index.rebase(index, view)
+                self._publish(generation=self.catalog.current().generation)
+
+    def _save_meta(self, generation: int, index, records: list,
+                   journal_seq: int, next_id: int):
+        def fill(tmp):
+            df = self._frame(records)
+            df.to_csv(os.path.join(tmp, SNAPSHOT_FILES["csv"]), index=False)
+            write_columnar(os.path.join(tmp, SNAPSHOT_FILES["metadata"]),
+                           records, list(df.columns))
+            faiss.write_index(index, os.path.join(tmp, SNAPSHOT_FILES["index"]))
+
+        # Files go to a fresh generation directory; the manifest rename is the
+        # single commit point, so a crash leaves either old or new, never a mix.
+        prev = read_generation(GEN_PATH) or {}
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        path = write_snapshot(SNAPSHOT_DIR, generation, fill)
+        write_generation(GEN_PATH, generation, complete=True, snapshot=path,
+                         journal_seq=journal_seq, next_id=next_id,
+                         embedding=self.model.cache_id, index=self._index_kind())
+        # Human-readable export of the catalog, plus the plain index and
+        # metadata paths read by consumers that do not follow the manifest
+        # (book_manager.py, 2_gradio_app.py, 1_prepare_data-era deployments)
+        atomic_write(CSV_PATH, lambda p: shutil.copyfile(
+            os.path.join(path, SNAPSHOT_FILES["csv"]), p))
+        atomic_write(INDEX_PATH, lambda p: shutil.copyfile(
+            os.path.join(path, SNAPSHOT_FILES["index"]), p))
+        tmp = f"{META_DIR}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(os.path.join(path, SNAPSHOT_FILES["metadata"]), tmp)
+        swap_dir(tmp, META_DIR)
+        # Keep the previous generation for readers still loading it
+        gc_snapshots(SNAPSHOT_DIR, keep=[path, prev.get("snapshot")])
 
     def add_book(self, details: dict) -> str:
-        self.df = pd.concat([self.df, pd.DataFrame([details])], ignore_index=True)
-        self.metadata.append(details)
-        self._load_or_build()
+        with metrics.request("add_book"), self._lock:
+            return self._add_book(details)
+
+    def _add_book(self, details: dict) -> str:
+        dup = self.lookup.duplicate_of(details)
+        if dup:
+            return f"❌ A book with {dup[0].upper()} {dup[1]} already exists."
+        self._insert([details])
         return "✅ Book successfully added."
 
+    def find_duplicate(self, details: dict):
+        """(field, isbn) if the book's ISBN13/ISBN10 is already in the catalog."""
+        with self._lock:
+            return self.lookup.duplicate_of(details)
+
+    def add_books(self, details_list: list) -> list:
+        """Add many (already validated) books: one batched encode, one index
+        insert and one persist. Books whose ISBN is already in the catalog
+        are skipped. Returns the new book ids."""
+        with metrics.request("add_books"), self._lock:
+            fresh, seen = [], set()
+            for details in details_list:
+                keys = {(f, BookLookup.FIELDS[f](details.get(f))) for f in ("isbn13", "isbn10")}
+                keys = {(f, k) for f, k in keys if k}
+                if self.lookup.duplicate_of(details) or keys & seen:
+                    logger.warning("Skipping duplicate ISBN: %s", details.get("title"))
+                    continue
+                seen |= keys
+                fresh.append(details)
+            return self._insert(fresh)
+
+    def _insert(self, details_list: list) -> list:
+        if not details_list:
+            return []
+        ids = list(range(self._next_id, self._next_id + len(details_list)))
+        self._next_id += len(details_list)
+        books = [{"book_id": book_id, **details}
+                 for book_id, details in zip(ids, details_list)]
+
+        # Encode and insert just the new books
+        with metrics.span("encode"):
+            embs = self.cache.encode([self._book_text(b) for b in books],
+                                     self._encode_bulk)
+        with metrics.span("index_add"):
+            self.index = self.index.add(embs, ids)
+        # Metadata before the view that can return these ids
+        self.metadata.update(zip(ids, books))
+        for book_id, book in zip(ids, books):
+            self.lookup.add(book_id, book)
+            self.lexical.add(book_id, book)
+        self._publish()
+        self._commit({"op": "add", "books": books})
+        return ids
+
     def remove_book(self, title: str) -> str:
-        mask = ~self.df["title"].str.lower().eq(title.strip().lower())
-        if mask.all():
-            return f"❌ No book found with title “{title}”."
-        self.df = self.df[mask].reset_index(drop=True)
-        self.metadata = self.df.to_dict(orient="records")
-        self._load_or_build()
-        return f"✅ Book titled “{title}” removed."
+        with metrics.request("remove_book"), self._lock:
+            ids = self.lookup.find("title", title)
+            if not ids:
+                return f"❌ No book found with title “{title}”."
+            self._remove_ids(ids)
+            return f"✅ Book titled “{title}” removed."
+
+    def remove_book_by_isbn(self, isbn: str) -> str:
+        with metrics.request("remove_book"), self._lock:
+            ids = self.lookup.find_isbn(isbn)
+            if not ids:
+                return f"❌ No book found with ISBN “{isbn}”."
+            titles = ", ".join(sorted({str(self.metadata[i].get("title", "")) for i in ids}))
+            self._remove_ids(ids)
+            return f"✅ Removed “{titles}” (ISBN {isbn})."
+
+    def _remove_ids(self, ids):
+        ids = np.array(sorted(ids), dtype=np.int64)
+
+        # Tombstone by id: no re-embedding, no rebuild, no index compaction
+        # here (compact() drops them); readers of the old view skip ids
+        # whose metadata is gone
+        with metrics.span("index_remove"):
+            self.index = self.index.remove(ids)
+        self._publish()
+        self._forget(ids)
+        self._commit({"op": "remove", "ids": ids.tolist()})
+
+    def _forget(self, ids):
+        for book_id in ids:
+            book = self.metadata.pop(int(book_id), None)
+            if book is not None:
+                self.lookup.remove(book_id, book)
+                self.lexical.remove(book_id, book)
@@ -0,0 +1,297 @@
+# metastore.py
+
+"""
+Columnar, memory-mapped book metadata:
+- Numeric columns stored as raw fixed-width arrays
+- String columns stored as one UTF-8 blob plus an array of end offsets
+- Rows kept in ascending book_id order, so lookups are a binary search
+- Readers memory-map every file; a row dict is only built when asked for
+- MetadataOverlay: a store plus journaled adds / removals, for readers
+  following edits made after the snapshot was written
+"""
+
+import os
+import json
+import pickle
+import shutil
+import numpy as np
+
+SCHEMA_FILE = "schema.json"
+
+# Everything else is stored as a string column
+NUMERIC_COLUMNS = {
+    "book_id":        "<i8",
+    "published_year": "<f8",
+    "average_rating": "<f8",
+    "num_pages":      "<f8",
+    "ratings_count":  "<f8",
+}
+# Whole-number columns come back as int; missing numbers come back as ""
+INT_COLUMNS = {"book_id", "published_year", "num_pages", "ratings_count"}
+
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _to_text(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    return str(value)
+
+
+class ColumnarWriter:
+    """Appends records column by column; `close` writes the schema last.
+
+    With `resume_rows`, an interrupted store is truncated to its first
+    `resume_rows` rows and appending continues from there.
+    """
+
+    def __init__(self, path: str, columns: list, resume_rows: int = 0):
+        if "book_id" not in columns:
+            raise ValueError("columnar metadata needs a book_id column")
+        self.path    = path
+        self.columns = list(columns)
+        self.rows    = resume_rows
+        self._last_id = None
+        self._blob_sizes = {}
+        os.makedirs(path, exist_ok=True)
+        self._files = {}
+        for col in self.columns:
+            if col in NUMERIC_COLUMNS:
+                width = np.dtype(NUMERIC_COLUMNS[col]).itemsize
+                self._files[col] = self._open(f"{col}.bin", resume_rows * width)
+            else:
+                ends_f = self._open(f"{col}.ends", resume_rows * 8)
+                size = self._last_value(f"{col}.ends", "<i8") if resume_rows else 0
+                self._files[col] = (ends_f, self._open(f"{col}.blob", size))
+                self._blob_sizes[col] = size
+        if resume_rows:
+            self._last_id = self._last_value("book_id.bin", "<i8")
+
+    def _open(self, name: str, keep_bytes: int):
+        f = open(os.path.join(self.path, name), "ab" if keep_bytes else "wb")
+        if keep_bytes:
+            f.truncate(keep_bytes)
+        return f
+
+    def _last_value(self, name: str, dtype: str) -> int:
+        return int(np.fromfile(os.path.join(self.path, name), dtype=dtype,
+                               count=1, offset=(self.rows - 1) * 8)[0])
+
+    def append(self, records: list):
+        if not records:
+            return
+        ids = np.array([int(r["book_id"]) for r in records], dtype="<i8")
+        if np.any(np.diff(ids) <= 0) or (self._last_id is not None and ids[0] <= self._last_id):
+            raise ValueError("records must be appended in ascending book_id order")
+        self._last_id = int(ids[-1])
+
+        for col in self.columns:
+            values = [r.get(col) for r in records]
+            if col in NUMERIC_COLUMNS:
+                dtype = NUMERIC_COLUMNS[col]
+                arr = ids if col == "book_id" else \
+                      np.array([_to_number(v) for v in values], dtype=dtype)
+                self._files[col].write(arr.astype(dtype).tobytes())
+            else:
+                ends_f, blob_f = self._files[col]
+                encoded = [_to_text(v).encode("utf-8") for v in values]
+                ends = self._blob_sizes[col] + np.cumsum([len(b) for b in encoded])
+                blob_f.write(b"".join(encoded))
+                ends_f.write(ends.astype("<i8").tobytes())
+                self._blob_sizes[col] = int(ends[-1])
+        self.rows += len(records)
+
+    def _handles(self):
+        for handles in self._files.values():
+            yield from (handles if isinstance(handles, tuple) else (handles,))
+
+    def flush(self):
+        """Make every appended row durable (used for build checkpoints)."""
+        for f in self._handles():
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        for f in self._handles():
+            f.close()
+        schema = {
+            "rows":    self.rows,
+            "columns": {c: NUMERIC_COLUMNS.get(c, "str") for c in self.columns},
+        }
+        with open(os.path.join(self.path, SCHEMA_FILE), "w") as f:
+            json.dump(schema, f)
+
+
+def write_columnar(path: str, records: list, columns: list):
+    """Write a full store next to `path`, then swap it into place."""
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    writer = ColumnarWriter(tmp, columns)
+    writer.append(sorted(records, key=lambda r: int(r["book_id"])))
+    writer.close()
+    swap_dir(tmp, path)
+
+
+def swap_dir(src: str, path: str):
+    """Move the finished store at `src` into place, replacing `path`."""
+    old = f"{path}.old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(src, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def is_columnar(path: str) -> bool:
+    return os.path.exists(os.path.join(path, SCHEMA_FILE))
+
+
+def _map(path: str, dtype: str, count: int):
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class ColumnarMetadata:
+    """Read-only, mmap-backed metadata keyed by book_id (dict-like)."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, SCHEMA_FILE), "r") as f:
+            schema = json.load(f)
+        self.rows    = schema["rows"]
+        self.columns = list(schema["columns"])
+        self._numeric = {}
+        self._strings = {}
+        for col, kind in schema["columns"].items():
+            if kind == "str":
+                ends = _map(os.path.join(path, f"{col}.ends"), "<i8", self.rows)
+                size = int(ends[-1]) if self.rows else 0
+                blob = _map(os.path.join(path, f"{col}.blob"), "u1", size)
+                self._strings[col] = (ends, blob)
+            else:
+                self._numeric[col] = _map(os.path.join(path, f"{col}.bin"), kind, self.rows)
+        self.ids = self._numeric["book_id"]
+
+    def __len__(self):
+        return self.rows
+
+    def row_of(self, book_id) -> int:
+        """Row position of `book_id`, or -1 if absent."""
+        pos = int(np.searchsorted(self.ids, book_id))
+        return pos if pos < self.rows and self.ids[pos] == book_id else -1
+
+    def rows_of(self, book_ids) -> np.ndarray:
+        """Vectorised `row_of`; missing ids map to -1."""
+        book_ids = np.asarray(book_ids, dtype="<i8")
+        if not self.rows:
+            return np.full(book_ids.shape, -1)
+        pos = np.minimum(np.searchsorted(self.ids, book_ids), self.rows - 1)
+        return np.where(self.ids[pos] == book_ids, pos, -1)
+
+    def column(self, name: str) -> np.ndarray:
+        """Memory-mapped numeric column, aligned with `ids`."""
+        return self._numeric[name]
+
+    def text(self, name: str, row: int) -> str:
+        ends, blob = self._strings[name]
+        start = int(ends[row - 1]) if row else 0
+        return bytes(blob[start:int(ends[row])]).decode("utf-8")
+
+    def record(self, row: int) -> dict:
+        rec = {}
+        for col in self.columns:
+            if col in self._strings:
+                rec[col] = self.text(col, row)
+                continue
+            v = self._numeric[col][row]
+            if col == "book_id":
+                rec[col] = int(v)
+            elif np.isnan(v):
+                rec[col] = ""
+            else:
+                rec[col] = int(v) if col in INT_COLUMNS else float(v)
+        return rec
+
+    def __contains__(self, book_id) -> bool:
+        return self.row_of(book_id) >= 0
+
+    def __getitem__(self, book_id) -> dict:
+        row = self.row_of(book_id)
+        if row < 0:
+            raise KeyError(book_id)
+        return self.record(row)
+
+    def get(self, book_id, default=None):
+        row = self.row_of(book_id)
+        return self.record(row) if row >= 0 else default
+
+
+def records_of(metadata):
+    """(book_id, record) pairs of any metadata form."""
+    if isinstance(metadata, ColumnarMetadata):
+        return ((int(i), metadata.record(r)) for r, i in enumerate(metadata.ids))
+    if isinstance(metadata, list):
+        return enumerate(metadata)
+    return metadata.items()
+
+
+class MetadataOverlay:
+    """Read-only view of a base store with added records and removed ids on
+    top; `add` / `remove` return a new view and leave this one untouched."""
+
+    def __init__(self, base, added: dict = None, removed=frozenset()):
+        self.base    = base
+        self.added   = added or {}
+        self.removed = frozenset(removed)
+
+    def get(self, book_id, default=None):
+        book_id = int(book_id)
+        if book_id in self.added:
+            return self.added[book_id]
+        if book_id in self.removed or book_id < 0:
+            return default
+        try:
+            return self.base[book_id]
+        except (KeyError, IndexError):
+            return default
+
+    def __getitem__(self, book_id) -> dict:
+        book = self.get(book_id)
+        if book is None:
+            raise KeyError(book_id)
+        return book
+
+    def __contains__(self, book_id) -> bool:
+        return self.get(book_id) is not None
+
+    def __len__(self):
+        return len(self.base) - len(self.removed) + len(self.added)
+
+    def items(self):
+        for book_id, book in records_of(self.base):
+            if book_id not in self.removed:
+                yield book_id, book
+        yield from self.added.items()
+
+    def add(self, books) -> "MetadataOverlay":
+        added = dict(self.added)
+        added.update((int(b["book_id"]), b) for b in books)
+        return MetadataOverlay(self.base, added, self.removed)
+
+    def remove(self, ids) -> "MetadataOverlay":
+        added = dict(self.added)
+        removed = {int(i) for i in ids if added.pop(int(i), None) is None}
+        return MetadataOverlay(self.base, added, self.removed | removed)
+
+
+def load_metadata(path: str, legacy_path: str = None):
+    """Open the columnar store at `path`, falling back to a legacy pickle."""
+    if is_columnar(path):
+        return ColumnarMetadata(path)
+    with open(legacy_path or path, "rb") as f:
+        return pickle.load(f)
@@ -0,0 +1,338 @@
+# metrics.py
+
+"""
+Request instrumentation:
+- span(stage): times one stage (query encode, FAISS search, sanitize, HTTP, ...)
+  into a per-stage latency histogram
+- request(op): times a whole request; spans inside it (on any branch thread
+  started with `submit`) are attached to the request's trace
+- begin/activate/end: the same for requests that outlive one `with` block,
+  such as a streaming generator resumed on different threads
+- Gauges pulled from caches at scrape time
+- Prometheus text format, served over a small background HTTP server
+- Opt-in sampling profiler: samples the stacks of threads working on a
+  request and dumps the slowest requests as collapsed stacks + span list
+"""
+
+import os
+import sys
+import time
+import heapq
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Seconds; Prometheus-style upper bounds, +Inf added on render
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (non-cumulative counts internally)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts  = [0] * (len(self.buckets) + 1)
+        self.sum     = 0.0
+        self.count   = 0
+        self._lock   = threading.Lock()
+
+    def observe(self, value: float):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            self.counts[i] += 1
+            self.sum   += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"' for k, v in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+class Registry:
+    """Named histograms keyed by label set, plus scrape-time gauge collectors."""
+
+    def __init__(self):
+        self._histograms = {}       # name -> (help, {labels tuple: Histogram})
+        self._collectors = {}       # (name, labels) -> (help, fn -> {stat: value})
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, **labels) -> Histogram:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, series = self._histograms.setdefault(name, (help_text, {}))
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+        return hist
+
+    def add_collector(self, name: str, help_text: str, fn, **labels):
+        """`fn()` returns a dict of numeric stats, exported as `name{stat=...}`.
+        Re-adding the same name and labels replaces the earlier collector."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._collectors[key] = (help_text, fn)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            histograms = {n: (h, dict(s)) for n, (h, s) in self._histograms.items()}
+            collectors = sorted(self._collectors.items(), key=lambda kv: kv[0])
+        for name, (help_text, series) in sorted(histograms.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for key, hist in sorted(series.items()):
+                labels = dict(key)
+                counts, total, n = hist.snapshot()
+                running = 0
+                for bound, c in zip(hist.buckets + (float("inf"),), counts):
+                    running += c
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {running}")
+                lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {n}")
+        seen = set()
+        for (name, key), (help_text, fn) in collectors:
+            labels = dict(key)
+            if name not in seen:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+                seen.add(name)
+            try:
+                stats = fn()
+            except Exception:
+                logger.exception("Metrics collector %s failed", name)
+                continue
+            for stat, value in sorted(stats.items()):
+                if isinstance(value, (int, float)):
+                    lines.append(f"{name}{_labels({**labels, 'stat': stat})} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# --- Spans and request traces -------------------------------------------------
+
+class Trace:
+    """Spans and participating threads of one request."""
+
+    def __init__(self, op: str):
+        self.op      = op
+        self.start   = time.perf_counter()
+        self.spans   = []           # (stage, offset_s, duration_s, thread name)
+        self.threads = {threading.get_ident()}
+        self.stacks  = Counter()    # collapsed stack -> samples (profiler only)
+        self.duration = None
+
+
+_current = contextvars.ContextVar("metrics_trace", default=None)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit that keeps spans attached to the current request."""
+    ctx = contextvars.copy_context()
+
+    def run():
+        trace = _current.get()
+        if trace is None:
+            return fn(*args, **kwargs)
+        tid = threading.get_ident()
+        trace.threads.add(tid)          # sampled by the profiler while it runs
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            trace.threads.discard(tid)
+    return executor.submit(ctx.run, run)
+
+
+@contextmanager
+def span(stage: str):
+    trace = _current.get()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        REGISTRY.histogram("library_stage_seconds",
+                           "Time spent in each request stage", stage=stage).observe(elapsed)
+        if trace is not None:
+            trace.spans.append((stage, t0 - trace.start, elapsed,
+                                threading.current_thread().name))
+
+
+def record_request(op: str, seconds: float):
+    REGISTRY.histogram("library_request_seconds",
+                       "End-to-end request latency", op=op).observe(seconds)
+
+
+@contextmanager
+def request(op: str):
+    """Time a whole request; nested inside another request it is just a span."""
+    if _current.get() is not None:
+        with span(op):
+            yield
+        return
+    trace = begin(op)
+    try:
+        with activate(trace):
+            yield
+    finally:
+        end(trace)
+
+
+def begin(op: str) -> Trace:
+    """Start a request trace by hand; run its work inside activate(trace)
+    (on whichever thread) and finish it with end(trace)."""
+    trace = Trace(op)
+    trace.threads.clear()           # only threads inside activate() count
+    if PROFILER is not None:
+        PROFILER.begin(trace)
+    return trace
+
+
+@contextmanager
+def activate(trace: Trace):
+    """Make `trace` current on this thread: spans attach to it and the
+    profiler samples the thread until the block ends."""
+    token = _current.set(trace)
+    tid = threading.get_ident()
+    trace.threads.add(tid)
+    try:
+        yield trace
+    finally:
+        trace.threads.discard(tid)
+        _current.reset(token)
+
+
+def end(trace: Trace):
+    trace.duration = time.perf_counter() - trace.start
+    record_request(trace.op, trace.duration)
+    if PROFILER is not None:
+        PROFILER.end(trace)
+
+
+# --- Slow-request profiler ------------------------------------------------------
+
+class SlowRequestProfiler(threading.Thread):
+    """Samples the stacks of threads serving active requests every `interval`
+    seconds; keeps the `keep` slowest requests and writes each one to
+    `out_dir` as its span list followed by collapsed stacks
+    (flamegraph.pl / speedscope input)."""
+
+    def __init__(self, out_dir: str, keep: int = 10, interval: float = 0.005):
+        super().__init__(daemon=True, name="slow-request-profiler")
+        self.out_dir  = out_dir
+        self.keep     = keep
+        self.interval = interval
+        self._active  = set()
+        self._slowest = []          # min-heap of (duration, path)
+        self._lock    = threading.Lock()
+        os.makedirs(out_dir, exist_ok=True)
+
+    def begin(self, trace: Trace):
+        with self._lock:
+            self._active.add(trace)
+
+    def end(self, trace: Trace):
+        with self._lock:
+            self._active.discard(trace)
+            if len(self._slowest) >= self.keep and trace.duration <= self._slowest[0][0]:
+                return
+            path = os.path.join(self.out_dir, f"{trace.op}-{int(trace.duration * 1000)}ms-"
+                                              f"{time.strftime('%Y%m%d-%H%M%S')}-{id(trace):x}.txt")
+            heapq.heappush(self._slowest, (trace.duration, path))
+            dropped = heapq.heappop(self._slowest)[1] if len(self._slowest) > self.keep else None
+        self._dump(trace, path)
+        if dropped:
+            try:
+                os.remove(dropped)
+            except OSError:
+                pass
+
+    def _dump(self, trace: Trace, path: str):
+        with open(path, "w") as f:
+            f.write(f"# {trace.op} {trace.duration * 1000:.1f} ms\n")
+            for stage, offset, duration, thread in sorted(trace.spans, key=lambda s: s[1]):
+                f.write(f"# span {stage:24s} +{offset * 1000:8.1f} ms "
+                        f"{duration * 1000:8.1f} ms  [{thread}]\n")
+            for stack, samples in trace.stacks.most_common():
+                f.write(f"{stack} {samples}\n")
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for trace in active:
+                for tid in list(trace.threads):
+                    frame = frames.get(tid)
+                    if frame is not None:
+                        trace.stacks[self._collapse(frame)] += 1
+
+
+PROFILER = None
+
+
+def enable_profiler(out_dir: str, keep: int = 10, interval: float = 0.005):
+    global PROFILER
+    if PROFILER is None:
+        PROFILER = SlowRequestProfiler(out_dir, keep, interval)
+        PROFILER.start()
+        logger.info("Profiling slowest %d requests into %s/", keep, out_dir)
+    return PROFILER
+
+
+# --- HTTP endpoint --------------------------------------------------------------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(port: int, host: str = "127.0.0.1"):
+    """Serve /metrics from a daemon thread; returns the server, or None if
+    the port cannot be bound (the app keeps running without it)."""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning("Metrics endpoint disabled: cannot bind %s:%d (%s)", host, port, e)
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    logger.info("Metrics on http://%s:%d/metrics", host, server.server_port)
+    return server
@@ -0,0 +1,108 @@
+# models.py
+
+"""
+Process-wide embedding model registry:
+- One lazily loaded model per (model, device, backend); the backend
+  (reference torch, int8-quantized, ONNX) comes from embedding_backends.py
+- Thread-safe, L2-normalised encode shared by manager, recommender and scripts
+- Reports parameter memory and load time so workers can be sized (logged
+  at load, and exported per encoder through the metrics registry)
+"""
+
+import time
+import logging
+import threading
+import numpy as np
+from config import EMBED_MODEL, EMBED_BACKEND
+from encoding_pool import l2_normalize
+from embedding_backends import load_model, model_bytes, cache_id, backend_device
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def default_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class SharedEncoder:
+    """A single model instance; loaded on first use, encodes one batch at a time."""
+
+    def __init__(self, model_name: str, device: str, backend: str = EMBED_BACKEND):
+        self.model_name   = model_name
+        self.device       = device
+        self.backend      = backend
+        self.load_seconds = None
+        self._model       = None
+        self._load_lock   = threading.Lock()
+        # HF fast tokenizers are not safe to share across concurrent calls
+        self._encode_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    t0 = time.perf_counter()
+                    model = load_model(self.model_name, self.device, self.backend)
+                    self.load_seconds = time.perf_counter() - t0
+                    self._model = model
+                    logger.info("Loaded %s (%s) on %s in %.2fs (%.1f MB)",
+                                self.model_name, self.backend, self.device,
+                                self.load_seconds, self.memory_bytes() / 2**20)
+        return self._model
+
+    @property
+    def cache_id(self) -> str:
+        """Embedding cache / manifest name: vectors differ per backend."""
+        return cache_id(self.model_name, self.backend)
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, normalize: bool = True, **kwargs) -> np.ndarray:
+        model = self.model
+        with self._encode_lock:
+            embs = model.encode(texts, convert_to_numpy=True, **kwargs)
+        return l2_normalize(embs) if normalize else embs.astype(np.float32)
+
+    def memory_bytes(self) -> int:
+        if self._model is None:
+            return 0
+        return model_bytes(self._model)
+
+    def stats(self) -> dict:
+        return {
+            "model":        self.model_name,
+            "device":       self.device,
+            "backend":      self.backend,
+            "loaded":       self.loaded,
+            "load_seconds": self.load_seconds,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+_encoders = {}
+_registry_lock = threading.Lock()
+
+
+def get_encoder(model_name: str = EMBED_MODEL, device: str = None,
+                backend: str = EMBED_BACKEND) -> SharedEncoder:
+    """Return the shared encoder for (model_name, device, backend), creating it if needed."""
+    device = backend_device(backend, device or default_device())
+    key = (model_name, device, backend)
+    with _registry_lock:
+        enc = _encoders.get(key)
+        if enc is None:
+            enc = _encoders[key] = SharedEncoder(model_name, device, backend)
+            metrics.REGISTRY.add_collector("library_encoder",
+                                           "Embedding model load time and memory",
+                                           enc.stats, model=model_name,
+                                           device=device, backend=backend)
+    return enc
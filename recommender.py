@@ -2,44 +2,186 @@
 
 """
 BookRecommender:
-- Loads FAISS index + metadata pickle
-- Embeds user prompt
-- Searches local + external
+- Reads FAISS index + memory-mapped columnar metadata from a catalog snapshot
+  (shared with the manager in-process, or reloaded from disk on new
+  generations with the journaled edits since applied on top)
+- Embeds user prompt (LRU-cached, once per request)
+- Ranks local hits semantically, lexically (BM25) or fused (RRF); ISBN and
+  quoted queries skip the embedding model entirely
+- Searches local + external concurrently (Google Books pages fetched in
+  parallel, responses cached on disk)
 - Filters & sorts
-- Renders HTML cards
+- recommend_stream: yields local results first, external ones when they land
+- recommend_many: batched encode + one multi-query search for many prompts
+- Renders compact HTML cards (shared CSS classes, fragments cached per
+  book id + catalog generation)
+- Times every stage into metrics histograms (see metrics.py)
 """
 
-import pickle
-import requests
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
-from config import INDEX_PATH, META_PATH, GOOGLE_API_KEY, LANGUAGES
+from config import (INDEX_PATH, INDEX_MMAP, INDEX_PARAMS, META_PATH, META_DIR, GEN_PATH,
+                    CATALOG_POLL_SECONDS, JOURNAL_PATH,
+                    QUERY_CACHE_SIZE, CARD_CACHE_SIZE, SEARCH_RANKING, LEXICAL_FAST_PATH,
+                    GOOGLE_API_KEY, LANGUAGES,
+                    API_CACHE_PATH, API_CACHE_TTL, API_CACHE_STALE_TTL,
+                    API_CACHE_MAX_ENTRIES, GOOGLE_BOOKS_URL,
+                    GOOGLE_BOOKS_WORKERS, EXTERNAL_DEADLINE,
+                    LOCAL_TIMEOUT, EXTERNAL_TIMEOUT)
+from catalog import Catalog, CatalogWatcher, read_generation, snapshot_path
+from models import get_encoder
+from metastore import load_metadata, records_of, ColumnarMetadata, MetadataOverlay
+from indexing import load_index, LayeredIndex
+from embedding_cache import book_text
+from journal import read_journal
+from lru_cache import LRUCache
+from cards import CARD_DESC_CHARS
+from lexical import LexicalIndex, classify_query, isbn_digits, tokenize, rrf_fuse
+from api_cache import ResponseCache
+from google_books import GoogleBooksClient
+import metrics
 
-import torch
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+logger = logging.getLogger(__name__)
 
 
 class BookRecommender:
     """Provides semantic & API-backed book recommendations with formatted cards."""
 
-    def __init__(self):
-        self.index = faiss.read_index(INDEX_PATH)
-        with open(META_PATH, "rb") as f:
-            self.metadata = pickle.load(f)
-        self.model   = SentenceTransformer("all-MiniLM-L6-v2", device=DEVICE)
+    def __init__(self, catalog: Catalog = None):
+        self.model   = get_encoder()
+        # Without a live catalog from a manager, follow the files on disk
+        if catalog is None:
+            catalog = Catalog()
+            watcher = CatalogWatcher(catalog, GEN_PATH, self._load_catalog,
+                                     CATALOG_POLL_SECONDS, JOURNAL_PATH,
+                                     tail_fn=lambda seq: read_journal(JOURNAL_PATH, seq),
+                                     apply_fn=self._apply_journal)
+            if not watcher.check():
+                catalog.publish(*self._load_catalog(), generation=0)
+            watcher.start()
+        self.catalog = catalog
         self.api_key = GOOGLE_API_KEY
+        self.query_cache = LRUCache(QUERY_CACHE_SIZE)
+        self.card_cache  = LRUCache(CARD_CACHE_SIZE)
+        self.api_cache   = ResponseCache(API_CACHE_PATH, API_CACHE_TTL,
+                                         API_CACHE_STALE_TTL, API_CACHE_MAX_ENTRIES)
+        self.books_api   = GoogleBooksClient(self.api_key, GOOGLE_BOOKS_URL,
+                                             self.api_cache,
+                                             workers=GOOGLE_BOOKS_WORKERS,
+                                             deadline=EXTERNAL_DEADLINE)
+        # BM25 over snapshots loaded from disk: (generation, index), built on demand
+        self._lexical      = (None, None)
+        self._lexical_lock = threading.Lock()
+        # Separate pools so local searches never queue behind slow external fetches
+        self._local_pool    = ThreadPoolExecutor(max_workers=8,
+                                                 thread_name_prefix="recommend-local")
+        self._external_pool = ThreadPoolExecutor(max_workers=GOOGLE_BOOKS_WORKERS,
+                                                 thread_name_prefix="recommend-external")
+        # Same names and labels: a newer recommender's caches replace these
+        metrics.REGISTRY.add_collector("library_query_cache",
+                                       "Query embedding LRU cache stats",
+                                       self.query_cache.stats)
+        metrics.REGISTRY.add_collector("library_api_cache",
+                                       "Google Books response cache stats",
+                                       self.api_cache.stats)
+        metrics.REGISTRY.add_collector("library_card_cache",
+                                       "Rendered card cache stats",
+                                       self.card_cache.stats)
+
+    @staticmethod
+    def _load_catalog(info: dict = None):
+        # Files named by the manifest; plain INDEX_PATH/META_DIR before the
+        # manager has written its first snapshot (e.g. 1_prepare_data output)
+        info = info or read_generation(GEN_PATH) or {}
+        built_with = info.get("embedding")
+        if built_with and built_with != get_encoder().cache_id:
+            logger.warning("Catalog index was embedded with %s but queries use %s; "
+                           "scores will be slightly off until it is rebuilt",
+                           built_with, get_encoder().cache_id)
+        if info.get("snapshot"):
+            return (load_index(snapshot_path(info, "index"), mmap=INDEX_MMAP,
+                               params=INDEX_PARAMS),
+                    load_metadata(snapshot_path(info, "metadata")))
+        return (load_index(INDEX_PATH, mmap=INDEX_MMAP, params=INDEX_PARAMS),
+                load_metadata(META_DIR, META_PATH))
+
+    def _apply_journal(self, index, metadata, entries):
+        """Edits journaled after a snapshot, layered over its index and
+        metadata (both stay untouched; compaction will fold them in)."""
+        if not isinstance(index, LayeredIndex):
+            index = LayeredIndex(index)
+        if not isinstance(metadata, MetadataOverlay):
+            metadata = MetadataOverlay(metadata)
+        for entry in entries:
+            if entry["op"] == "add":
+                # Skip ids already in the snapshot (crash mid-compaction)
+                books = [b for b in entry["books"] if b["book_id"] not in metadata]
+                if books:
+                    with metrics.span("journal_encode"):
+                        embs = self.embed([book_text(b) for b in books])
+                    index = index.add(embs, [b["book_id"] for b in books])
+                    metadata = metadata.add(books)
+            elif entry["op"] == "remove":
+                index = index.remove(entry["ids"])
+                metadata = metadata.remove(entry["ids"])
+        return index, metadata
+
+    def _lexical_for(self, snap):
+        """The snapshot's BM25 index. The manager publishes one; for
+        snapshots read from disk it is built on first use per generation,
+        so semantic-only traffic never materialises the catalog rows."""
+        if snap.lexical is not None:
+            return snap.lexical
+        with self._lexical_lock:
+            generation, lexical = self._lexical
+            if generation != snap.generation:
+                with metrics.span("lexical_build"):
+                    lexical = LexicalIndex.build(records_of(snap.metadata))
+                self._lexical = (snap.generation, lexical)
+            return lexical
 
     def embed(self, texts):
-        embs = self.model.encode(texts, convert_to_numpy=True)
-        norms = np.linalg.norm(embs, axis=1, keepdims=True)
-        return (embs / np.clip(norms, 1e-8, None)).astype(np.float32)
+        return self.model.encode(texts)
+
+    @staticmethod
+    def normalize_query(text: str) -> str:
+        # all-MiniLM-L6-v2 is uncased, so case and spacing do not change the vector
+        return " ".join((text or "").lower().split())
+
+    def embed_query(self, query: str) -> np.ndarray:
+        key = self.normalize_query(query)
+        q_emb = self.query_cache.get(key)
+        if q_emb is None:
+            with metrics.span("query_encode"):
+                q_emb = self.embed([key])[0]
+            self.query_cache.put(key, q_emb)
+        return q_emb
+
+    def embed_queries(self, queries) -> np.ndarray:
+        """Batch form of embed_query: cache misses share one forward pass."""
+        keys  = [self.normalize_query(q) for q in queries]
+        found = {k: self.query_cache.get(k) for k in dict.fromkeys(keys)}
+        missing = [k for k, v in found.items() if v is None]
+        if missing:
+            with metrics.span("query_encode"):
+                embs = self.embed(missing)
+            for k, q_emb in zip(missing, embs):
+                self.query_cache.put(k, q_emb)
+                found[k] = q_emb
+        if not keys:
+            return np.zeros((0, self.model.dim), dtype=np.float32)
+        return np.stack([found[k] for k in keys])
 
     def sanitize(self, raw: dict, source: str) -> dict:
         def clean(x): return (x or "").strip()
         auth = raw.get("authors") or raw.get("authors_list") or ""
         if isinstance(auth, list): auth = ", ".join(auth)
         return {
+            "book_id":        raw.get("book_id"),
             "title":          clean(raw.get("title")),
             "authors":        clean(auth),
             "description":    clean(raw.get("description")),
@@ -55,136 +197,378 @@ class BookRecommender:
             "source":         source,
         }
 
-    def _search_local(self, query, lang_code, pool_k):
-        q_emb = self.embed([query])
-        D, I  = self.index.search(q_emb, pool_k)
+    @staticmethod
+    def classify(query: str):
+        """classify_query(), or always "semantic" with the fast path off."""
+        return classify_query(query) if LEXICAL_FAST_PATH else ("semantic", None)
+
+    @staticmethod
+    def _lexical_hits(lexical, kind, terms, query, k):
+        """Best-first (book_id, score) from BM25, scores scaled to [0, 1]."""
+        if lexical is None:
+            return []
+        with metrics.span("lexical_search"):
+            if kind == "isbn":
+                return [(i, 1.0) for i in lexical.exact(terms)[:k]]
+            hits = lexical.search(terms if kind == "keyword" else tokenize(query), k)
+        top = hits[0][1] if hits else 1.0
+        return [(i, s / top) for i, s in hits]
+
+    def _search_local(self, query, lang_code, pool_k, q_emb=None):
+        kind, terms = self.classify(query)
+        semantic = kind == "semantic" and SEARCH_RANKING != "lexical"
+        if semantic and q_emb is None:
+            q_emb = self.embed_query(query)
+        snap = self.catalog.current()
+        if not semantic:
+            hits = self._lexical_hits(self._lexical_for(snap), kind, terms,
+                                      query, pool_k)
+        else:
+            with metrics.span("faiss_search"):
+                D, I = snap.index.search(q_emb[None, :], pool_k)
+            hits = [(int(i), float(d)) for d, i in zip(D[0], I[0]) if i >= 0]
+            if SEARCH_RANKING == "hybrid":
+                lex = self._lexical_hits(self._lexical_for(snap), kind, terms,
+                                         query, pool_k)
+                hits = rrf_fuse([[i for i, _ in hits], [i for i, _ in lex]], pool_k)
         results = []
-        for sim, idx in zip(D[0], I[0]):
-            if idx < 0: continue
-            b = self.sanitize(self.metadata[idx], "Local")
-            if lang_code and b["language"] != lang_code:
-                continue
-            b["similarity"] = float(sim)
-            results.append(b)
+        with metrics.span("sanitize"):
+            for book_id, sim in hits:
+                raw = self._lookup(snap.metadata, book_id)
+                if raw is None:
+                    continue
+                b = self.sanitize(raw, "Local")
+                if lang_code and b["language"] != lang_code:
+                    continue
+                b["similarity"] = sim
+                results.append(b)
         return results
 
-    def _search_external(self, query, lang_code, pool_k):
-        items, start = [], 0
-        while len(items) < pool_k:
-            batch = min(40, pool_k - len(items))
-            params = {
-                "q":          query,
-                "maxResults": batch,
-                "startIndex": start,
-                "key":        self.api_key,
-                "orderBy":    "relevance",
-            }
-            if lang_code:
-                params["langRestrict"] = lang_code
-            try:
-                res = requests.get(
-                    "https://www.googleapis.com/books/v1/volumes",
-                    params=params, timeout=5
-                ).json()
-            except Exception:
-                break
-            batch_items = res.get("items", [])
-            if not batch_items: break
-            items += batch_items
-            start += len(batch_items)
-            if len(batch_items) < batch: break
-
-        clean_raw = [
-            self.sanitize(v.get("volumeInfo", {}), "External")
-            for v in items
-        ]
-        texts = [b["title"] + ". " + b["description"] for b in clean_raw]
-        if texts:
-            embs  = self.embed(texts)
-            q_emb = self.embed([query])[0]
-            sims  = embs.dot(q_emb)
-            for b, s in zip(clean_raw, sims):
+    def _search_external(self, query, lang_code, pool_k, q_emb=None):
+        # q_emb may be a Future, so the fetch can start before the query is embedded
+        kind, _ = self.classify(query)
+        with metrics.span("google_books_http"):
+            items = self.books_api.search(self._api_query(query, kind), lang_code, pool_k)
+        if not items:
+            return []
+        if kind != "semantic":
+            return self._api_order(items)
+        if isinstance(q_emb, Future):
+            q_emb = q_emb.result()
+        if q_emb is None:
+            q_emb = self.embed_query(query)
+        return self._rank_external([items], [q_emb])[0]
+
+    @staticmethod
+    def _api_query(query: str, kind: str) -> str:
+        return f"isbn:{isbn_digits(query)}" if kind == "isbn" else query
+
+    def _api_order(self, items) -> list:
+        """Exact lookups: keep the API's order instead of re-embedding."""
+        with metrics.span("sanitize"):
+            pool = [self.sanitize(v.get("volumeInfo", {}), "External") for v in items]
+        for rank, b in enumerate(pool):
+            b["similarity"] = 1.0 - rank / len(pool)
+        return pool
+
+    def _rank_external(self, item_lists, q_embs):
+        """Sanitize and score each prompt's API items; one encode for all of them."""
+        with metrics.span("sanitize"):
+            pools = [[self.sanitize(v.get("volumeInfo", {}), "External") for v in items]
+                     for items in item_lists]
+        texts = [b["title"] + ". " + b["description"] for pool in pools for b in pool]
+        with metrics.span("external_embed"):
+            embs = self.embed(texts) if texts else None
+        start = 0
+        for pool, q_emb in zip(pools, q_embs):
+            sims = embs[start:start + len(pool)].dot(q_emb) if pool else []
+            start += len(pool)
+            for b, s in zip(pool, sims):
                 b["similarity"] = float(s)
-        else:
-            for b in clean_raw:
-                b["similarity"] = 0.0
+            pool.sort(key=lambda x: x["similarity"], reverse=True)
+        return pools
+
+    @staticmethod
+    def _branch_result(future, stop, name):
+        """The branch's results, or [] once `stop` passes (None: no deadline)."""
+        if future is None:
+            return []
+        if stop is None:
+            return future.result()
+        try:
+            return future.result(timeout=max(0.0, stop - time.monotonic()))
+        except FuturesTimeout:
+            logger.warning("%s search timed out; returning without it", name)
+            return []
 
-        return sorted(clean_raw, key=lambda x: x["similarity"], reverse=True)
+    @staticmethod
+    def _top_n(pool, n, min_rating):
+        high = [b for b in pool if b["average_rating"]>=min_rating]
+        low  = [b for b in pool if b["average_rating"]<min_rating]
+        return high[:n] + low[:max(0, n-len(high))]
 
     def recommend(
         self, prompt, language, local_n, external_n,
         min_rating, search_mode, sort_by
+    ):
+        with metrics.request("recommend"):
+            for locals, externals in self._recommend_steps(
+                    prompt, language, local_n, external_n,
+                    min_rating, search_mode, sort_by):
+                pass
+            return locals, externals
+
+    def recommend_stream(
+        self, prompt, language, local_n, external_n,
+        min_rating, search_mode, sort_by
+    ):
+        """recommend() as a generator for progressive UIs.
+
+        Yields (locals, None) as soon as the local search is done while the
+        external search is still running, then the final (locals, externals).
+        """
+        # Not a metrics.request(): the UI may resume each step on another
+        # thread, so the trace is re-activated around every step
+        trace = metrics.begin("recommend_stream")
+        steps = self._recommend_steps(prompt, language, local_n, external_n,
+                                      min_rating, search_mode, sort_by)
+        try:
+            while True:
+                with metrics.activate(trace):
+                    step = next(steps, None)
+                if step is None:
+                    return
+                yield step
+        finally:
+            steps.close()
+            metrics.end(trace)
+
+    def _recommend_steps(
+        self, prompt, language, local_n, external_n,
+        min_rating, search_mode, sort_by
     ):
         lang_code = LANGUAGES.get(language, "")
-        locals, externals = [], []
+        local_n, external_n = int(local_n), int(external_n)
+        want_local    = search_mode in ("Both","Local Only") and local_n>0
+        want_external = search_mode in ("Both","External Only") and external_n>0
+        start = time.monotonic()
 
-        if search_mode in ("Both","Local Only") and local_n>0:
-            pool = self._search_local(prompt, lang_code, local_n*5)
-            high = [b for b in pool if b["average_rating"]>=min_rating]
-            locals = (high[:local_n]
-                      + pool[:max(0, local_n-len(high))])
+        # Both branches run concurrently; the external fetch starts before
+        # the query is embedded and picks the vector up once it is ready.
+        # Lexical-only queries never need the vector.
+        kind, _ = self.classify(prompt)
+        need_emb = (want_local and kind == "semantic" and SEARCH_RANKING != "lexical") \
+                   or (want_external and kind == "semantic")
+        q_emb = Future()
+        local_f = external_f = None
+        if want_external:
+            external_f = metrics.submit(
+                self._external_pool, self._search_external, prompt, lang_code, external_n*5, q_emb)
+        if need_emb:
+            try:
+                q_emb.set_result(self.embed_query(prompt))
+            except Exception as e:
+                q_emb.set_exception(e)
+                raise
+        else:
+            q_emb.set_result(None)
+        if want_local:
+            local_f = metrics.submit(
+                self._local_pool, self._search_local, prompt, lang_code, local_n*5, q_emb.result())
+
+        # Budgets only cut a branch short when the other one has results to
+        # show; the local one starts at submission, so a slow embed (first
+        # model load, encoder busy) does not use it up
+        both = want_local and want_external
+        locals = self._branch_result(
+            local_f, time.monotonic() + LOCAL_TIMEOUT if both else None, "Local")
+        with metrics.span("filter_sort"):
+            locals = self._sorted(self._top_n(locals, local_n, min_rating), sort_by)
+        if external_f is not None:
+            yield locals, None
 
-        if search_mode in ("Both","External Only") and external_n>0:
-            pool = self._search_external(prompt, lang_code, external_n*5)
-            high = [b for b in pool if b["average_rating"]>=min_rating]
-            externals = (high[:external_n]
-                         + pool[:max(0, external_n-len(high))])
+        externals = self._branch_result(
+            external_f, start + EXTERNAL_TIMEOUT if both else None, "External")
+        with metrics.span("filter_sort"):
+            externals = self._sorted(self._top_n(externals, external_n, min_rating), sort_by)
+        yield locals, externals
 
+    @staticmethod
+    def _sorted(books, sort_by):
         keyfn = (lambda b: (b["average_rating"], b["similarity"])) \
                 if sort_by=="Rating" else (lambda b: b["similarity"])
-        locals    = sorted(locals,    key=keyfn, reverse=True)
-        externals = sorted(externals, key=keyfn, reverse=True)
-        return locals, externals
+        return sorted(books, key=keyfn, reverse=True)
+
+    @staticmethod
+    def _lookup(metadata, book_id):
+        """The record for `book_id`, or None if the metadata has no such id
+        (an index hit whose row was dropped from the snapshot)."""
+        if book_id < 0:
+            return None
+        try:
+            return metadata[book_id]
+        except (KeyError, IndexError):
+            return None
+
+    @classmethod
+    def _hit_fields(cls, metadata, I):
+        """(rating, language, present) arrays shaped like the search result
+        ids `I`, read straight from columns when the metadata is columnar."""
+        flat = I.ravel()
+        if isinstance(metadata, ColumnarMetadata):
+            rows = metadata.rows_of(flat)
+            ok   = rows >= 0
+            safe = np.maximum(rows, 0)
+            ratings = np.zeros(flat.shape)
+            if "average_rating" in metadata.columns:
+                ratings = np.where(ok, np.nan_to_num(
+                    metadata.column("average_rating")[safe]), 0.0)
+            langs = np.full(flat.shape, "", dtype=object)
+            if "language" in metadata.columns:
+                uniq, inv = np.unique(rows, return_inverse=True)
+                vals = np.array([metadata.text("language", r).strip().lower()
+                                 if r >= 0 else "" for r in uniq], dtype=object)
+                langs = vals[inv.ravel()]
+        else:
+            books   = [cls._lookup(metadata, int(i)) for i in flat]
+            ok      = np.array([b is not None for b in books], dtype=bool)
+            books   = [b or {} for b in books]
+            ratings = np.array([float(b.get("average_rating")
+                                      or b.get("averageRating") or 0) for b in books])
+            langs   = np.array([str(b.get("language") or "").strip().lower()
+                                for b in books], dtype=object)
+        return ratings.reshape(I.shape), langs.reshape(I.shape), ok.reshape(I.shape)
+
+    def _local_many(self, q_embs, lang_code, n, min_rating):
+        snap = self.catalog.current()
+        with metrics.span("faiss_search"):
+            D, I = snap.index.search(q_embs, n*5)
+        ratings, langs, keep = self._hit_fields(snap.metadata, I)
+        if lang_code:
+            keep &= langs == lang_code
+        high = keep & (ratings >= min_rating)
+
+        # Same selection as _top_n, on masks: rated hits first, then fill
+        # from the rest of the language-filtered pool; only picked rows are
+        # materialised.
+        results = []
+        with metrics.span("sanitize"):
+            for q in range(len(I)):
+                top  = np.flatnonzero(high[q])[:n]
+                fill = np.flatnonzero(keep[q] & ~high[q])[:max(0, n - len(top))]
+                picks = []
+                for j in np.concatenate([top, fill]):
+                    raw = self._lookup(snap.metadata, int(I[q, j]))
+                    if raw is None:
+                        continue        # removed since _hit_fields read it
+                    b = self.sanitize(raw, "Local")
+                    b["similarity"] = float(D[q, j])
+                    picks.append(b)
+                results.append(picks)
+        return results
+
+    def recommend_many(
+        self, prompts, language, local_n, external_n,
+        min_rating, search_mode, sort_by
+    ):
+        """recommend() for many prompts: one batched encode, one index.search.
+
+        Returns a list of (locals, externals) pairs, one per prompt.
+        """
+        with metrics.request("recommend_many"):
+            return self._recommend_many(prompts, language, local_n, external_n,
+                                        min_rating, search_mode, sort_by)
+
+    def _recommend_many(
+        self, prompts, language, local_n, external_n,
+        min_rating, search_mode, sort_by
+    ):
+        prompts = list(prompts)
+        lang_code = LANGUAGES.get(language, "")
+        local_n, external_n = int(local_n), int(external_n)
+        want_local    = search_mode in ("Both","Local Only") and local_n>0
+        want_external = search_mode in ("Both","External Only") and external_n>0
+
+        # Same per-prompt routing as recommend(): ISBN / quoted prompts are
+        # exact lookups that are never embedded
+        kinds = [self.classify(p)[0] for p in prompts]
+        fetches = [metrics.submit(self._external_pool, self.books_api.search,
+                                  self._api_query(p, kind), lang_code, external_n*5)
+                   for p, kind in zip(prompts, kinds)] if want_external else []
+        sem = [i for i, kind in enumerate(kinds) if kind == "semantic"]
+        q_embs = self.embed_queries([prompts[i] for i in sem]) \
+                 if sem and (want_local or want_external) else None
+        emb_of = dict(zip(sem, q_embs)) if q_embs is not None else {}
+
+        locals = [[] for _ in prompts]
+        if want_local and prompts:
+            # Semantic prompts share one index.search; the rest go one by one
+            batched = sem if SEARCH_RANKING == "semantic" else []
+            if batched:
+                for i, picks in zip(batched, self._local_many(
+                        q_embs, lang_code, local_n, min_rating)):
+                    locals[i] = picks
+            for i in sorted(set(range(len(prompts))) - set(batched)):
+                locals[i] = self._top_n(
+                    self._search_local(prompts[i], lang_code, local_n*5, emb_of.get(i)),
+                    local_n, min_rating)
+        externals = [[] for _ in prompts]
+        if fetches:
+            with metrics.span("google_books_http"):
+                items = [f.result() for f in fetches]
+            pools = [self._api_order(its) if kind != "semantic" and its else []
+                     for its, kind in zip(items, kinds)]
+            ranked = self._rank_external([items[i] for i in sem], [emb_of[i] for i in sem])
+            for i, pool in zip(sem, ranked):
+                pools[i] = pool
+            externals = [self._top_n(pool, external_n, min_rating) for pool in pools]
+
+        return [(self._sorted(l, sort_by), self._sorted(e, sort_by))
+                for l, e in zip(locals, externals)]
 
     def create_card(self, b: dict) -> str:
-        return f"""
-<div style="
-  background: var(--card-bg);
-  color: var(--card-fg);
-  border-radius:8px;
-  box-shadow:0 2px 8px rgba(0,0,0,0.1);
-  overflow:hidden;
-  display:flex;flex-direction:column;
-">
-  <img src="{b['thumbnail']}" style="
-    width:100%;aspect-ratio:2/3;object-fit:cover;
-  "/>
-  <div style="padding:1rem;flex:1;display:flex;flex-direction:column;">
-    <h3 style="margin:0 0 .5rem;font-size:1.1rem;">
-      {b['title']}
-    </h3>
-    <p style="margin:0;font-size:.9rem;color:var(--subtle);">
-      {b['authors']}
-    </p>
-    <p style="margin:.5rem 0;font-size:.9rem;color:var(--subtle);">
-      ⭐ {b['average_rating']} ({b['ratings_count']})
-    </p>
-    <p style="
-      flex:1;margin:0 0 .75rem;
-      font-size:.9rem;color:var(--subtle);
-      overflow:hidden;max-height:4.5rem;
-    ">
-      {b['description']}
-    </p>
-    <a href="{b['info_link']}" target="_blank" style="
-      text-decoration:none;color:var(--link);font-weight:500;
-    ">
-      More Info →
-    </a>
-  </div>
-</div>"""
+        desc = b["description"]
+        if len(desc) > CARD_DESC_CHARS:
+            desc = desc[:CARD_DESC_CHARS].rsplit(" ", 1)[0] + "…"
+        return (
+            f'<div class="book-card"><img src="{b["thumbnail"]}"/>'
+            f'<div class="card-body"><h3>{b["title"]}</h3>'
+            f'<p>{b["authors"]}</p>'
+            f'<p class="rating">⭐ {b["average_rating"]} ({b["ratings_count"]})</p>'
+            f'<p class="desc">{desc}</p>'
+            f'<a href="{b["info_link"]}" target="_blank">More Info →</a></div></div>'
+        )
+
+    def _card(self, b: dict, generation: int) -> str:
+        # Local cards are keyed by book id, external ones by volume link;
+        # the catalog generation retires fragments after every change.
+        if b.get("book_id") not in (None, ""):
+            key = ("Local", b["book_id"], generation)
+        elif b.get("info_link", "#") != "#":
+            key = (b["source"], b["info_link"], generation)
+        else:
+            return self.create_card(b)
+        html = self.card_cache.get(key)
+        if html is None:
+            html = self.create_card(b)
+            self.card_cache.put(key, html)
+        return html
 
     def format_books(self, locals, externals) -> str:
-        html = [
-            '<div style="display:grid;'
-            'grid-template-columns:repeat(auto-fill,minmax(240px,1fr));'
-            'gap:1rem;">',
-            '<h2 style="grid-column:1/-1;">📚 Local Recommendations</h2>'
-        ]
-        html += [self.create_card(b) for b in locals] or \
-                ['<p style="grid-column:1/-1;">No local results.</p>']
-        html.append('<h2 style="grid-column:1/-1;">🌐 External Recommendations</h2>')
-        html += [self.create_card(b) for b in externals] or \
-                ['<p style="grid-column:1/-1;">No external results.</p>']
+        with metrics.span("render"):
+            return self._format_books(locals, externals)
+
+    def _format_books(self, locals, externals) -> str:
+        snap = self.catalog.current()
+        generation = snap.generation if snap is not None else 0
+        html = ['<div class="book-grid">', "<h2>📚 Local Recommendations</h2>"]
+        html += [self._card(b, generation) for b in locals] or \
+                ['<p class="no-results">No local results.</p>']
+        html.append("<h2>🌐 External Recommendations</h2>")
+        if externals is None:
+            html.append('<p class="no-results">Searching external sources…</p>')
+        else:
+            html += [self._card(b, generation) for b in externals] or \
+                    ['<p class="no-results">No external results.</p>']
         html.append("</div>")
-        return "\n".join(html)
+        return "".join(html)
@@ -0,0 +1,97 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+
+from indexing import INDEX_TYPES, LayeredIndex, build_index, load_index
+
+DIM = 384
+PARAMS = {"ivf_nlist": 16, "ivf_nprobe": 16, "pq_m": 48, "pq_nbits": 4,
+          "train_size": 5000}
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((2000, DIM)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+@pytest.fixture(scope="module")
+def ids(vectors):
+    return np.arange(len(vectors), dtype=np.int64) + 100
+
+
+@pytest.fixture(scope="module")
+def indexes(vectors, ids):
+    # Training (IVF-PQ especially) dominates; build each kind once
+    return {kind: build_index(DIM, vectors, ids, kind, "flat", PARAMS)
+            for kind in INDEX_TYPES}
+
+
+@pytest.mark.parametrize("kind", INDEX_TYPES)
+@pytest.mark.parametrize("mmap", [False, True])
+def test_round_trip(tmp_path, vectors, indexes, kind, mmap):
+    index = indexes[kind]
+    path = str(tmp_path / f"{kind}.faiss")
+    faiss.write_index(index, path)
+
+    loaded = load_index(path, mmap=mmap, params=PARAMS)
+    assert loaded.ntotal == len(vectors)
+    expected = index.search(vectors[:20], 5)
+    got = loaded.search(vectors[:20], 5)
+    np.testing.assert_array_equal(expected[1], got[1])
+    np.testing.assert_allclose(expected[0], got[0], rtol=1e-5)
+
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw"])
+def test_layered_index_tombstones_and_compacts(vectors, ids, indexes, kind):
+    base, rebuilds = indexes[kind], []
+    view = LayeredIndex(base)
+    extra = vectors[:3] * -1
+    view = view.add(extra, [10, 11, 12]).remove([100, 101, 11])
+    assert base.ntotal == len(vectors)          # published base untouched
+    assert view.ntotal == len(vectors) - 2 + 2
+
+    _, got = view.search(vectors[:2], 5)
+    assert not np.isin(got, [100, 101, 11]).any()
+    _, got = view.search(extra[[0, 2]], 1)
+    assert got[:, 0].tolist() == [10, 12]
+
+    def rebuild():
+        rebuilds.append(1)
+        keep = ~np.isin(ids, [100, 101])
+        return build_index(DIM, np.vstack([vectors[keep], extra[[0, 2]]]),
+                           np.concatenate([ids[keep], [10, 12]]), kind, "flat", PARAMS)
+
+    compacted = view.compacted(rebuild)
+    assert compacted.ntotal == view.ntotal
+    assert len(rebuilds) == (kind == "hnsw")    # only HNSW cannot delete by id
+    assert base.ntotal == len(vectors)
+
+    # Edits made while compacting stay layered over the new base
+    later = view.add(vectors[:1] * -1, [13]).remove([12, 102])
+    rebased = later.rebase(compacted, view)
+    assert rebased.delta_ids.tolist() == [13]
+    assert rebased.dead == {12, 102}
+    assert rebased.ntotal == later.ntotal
+
+
+def test_small_catalog_defers_training(vectors, ids):
+    # Too few vectors to train SQ8: an exact stand-in until compaction has enough
+    small = build_index(DIM, vectors[:5], ids[:5], "flat", "sq8", PARAMS)
+    assert small.is_trained and small.ntotal == 5
+    _, got = small.search(vectors[:5], 1)
+    assert got[:, 0].tolist() == ids[:5].tolist()
+
+    rebuilt = []
+    def rebuild():
+        rebuilt.append(1)
+        return build_index(DIM, vectors, ids, "flat", "sq8", PARAMS)
+
+    view = LayeredIndex(small).add(vectors[5:50], ids[5:50])
+    assert view.compacted(rebuild, trainable=True).ntotal == 50
+    assert not rebuilt                          # still too few; exact add
+    view = LayeredIndex(small).add(vectors[5:], ids[5:])
+    assert view.compacted(rebuild, trainable=True).ntotal == len(vectors)
+    assert rebuilt == [1]
@@ -0,0 +1,101 @@
+import os
+import json
+
+from catalog import (gc_snapshots, read_generation, snapshot_dir, snapshot_path,
+                     write_generation, write_snapshot)
+from journal import Journal
+
+
+def add(book_id):
+    return {"op": "add", "books": [{"book_id": book_id, "title": f"Book {book_id}"}]}
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = Journal(path, fsync=False)
+    journal.append(add(1))
+    journal.append(add(2))
+    journal.close()
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b'{"seq":3,"op":"add","bo')        # crash mid-append
+
+    journal = Journal(path, fsync=False)
+    assert os.path.getsize(path) == size
+    assert journal.last_seq == 2
+    assert len(journal) == 2
+    assert journal.append(add(3)) == 3
+    assert [e["seq"] for e in journal.replay()] == [1, 2, 3]
+    journal.close()
+
+
+def test_replay_after_seq(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"), fsync=False)
+    journal.append_many([add(i) for i in range(5)])
+    assert [e["seq"] for e in journal.replay(3)] == [4, 5]
+    assert [e["books"][0]["book_id"] for e in journal.replay(3)] == [3, 4]
+    assert list(journal.replay(5)) == []
+    journal.close()
+
+
+def test_truncate_through_keeps_seq_numbering(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = Journal(path, fsync=False)
+    journal.append_many([add(i) for i in range(4)])
+    journal.truncate_through(3)
+    assert len(journal) == 1
+    assert [e["seq"] for e in journal.replay()] == [4]
+    journal.close()
+
+    # Only the checkpoint line remembers seqs 1-3 across a restart
+    journal = Journal(path, fsync=False)
+    assert journal.last_seq == 4
+    assert journal.append(add(4)) == 5
+    journal.truncate_through(5)
+    journal.close()
+    assert Journal(path, fsync=False).last_seq == 5
+
+
+def test_min_seq_survives_lost_journal(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"), fsync=False, min_seq=7)
+    assert len(journal) == 0
+    assert journal.append(add(1)) == 8
+    journal.close()
+
+
+def test_snapshot_committed_by_manifest(tmp_path):
+    root = str(tmp_path / "snapshots")
+    gen_path = str(tmp_path / "generation.json")
+    os.makedirs(root)
+
+    def fill(tmp):
+        with open(os.path.join(tmp, "books.csv"), "w") as f:
+            f.write("book_id,title\n1,Book 1\n")
+
+    path = write_snapshot(root, 3, fill)
+    assert path == snapshot_dir(root, 3)
+    assert not os.path.exists(f"{path}.tmp")
+    assert read_generation(gen_path) is None        # written but not committed
+
+    write_generation(gen_path, 3, True, snapshot=path, journal_seq=12, next_id=2)
+    info = read_generation(gen_path)
+    assert info["generation"] == 3 and info["complete"]
+    assert info["journal_seq"] == 12 and info["next_id"] == 2
+    with open(snapshot_path(info, "csv")) as f:
+        assert f.read().startswith("book_id,title")
+
+    with open(gen_path, "w") as f:
+        f.write('{"generation": 4, "comp')          # torn manifest reads as missing
+    assert read_generation(gen_path) is None
+
+
+def test_gc_snapshots_keeps_listed_dirs(tmp_path):
+    root = str(tmp_path / "snapshots")
+    os.makedirs(root)
+    for generation in range(1, 5):
+        write_snapshot(root, generation, lambda tmp: None)
+    with open(os.path.join(root, "notes.json"), "w") as f:
+        json.dump({}, f)
+
+    gc_snapshots(root, [snapshot_dir(root, 4), snapshot_dir(root, 3), None])
+    assert sorted(os.listdir(root)) == ["gen-00000003", "gen-00000004", "notes.json"]
@@ -0,0 +1,88 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from metastore import (ColumnarMetadata, ColumnarWriter, MetadataOverlay,
+                       load_metadata, write_columnar)
+
+COLUMNS = ["book_id", "title", "authors", "average_rating", "num_pages", "published_year"]
+
+
+def record(book_id):
+    return {
+        "book_id":        book_id,
+        "title":          f"Bücher {book_id}",       # multi-byte UTF-8
+        "authors":        "" if book_id % 4 == 0 else f"Author {book_id}",
+        "average_rating": book_id / 10,
+        "num_pages":      "" if book_id % 5 == 0 else 100 + book_id,
+        "published_year": 1990 + book_id,
+    }
+
+
+def test_write_read_round_trip(tmp_path):
+    path = str(tmp_path / "meta")
+    records = [record(i) for i in (7, 3, 12, 20, 5)]    # unsorted on purpose
+    write_columnar(path, records, COLUMNS)
+
+    meta = load_metadata(path)
+    assert isinstance(meta, ColumnarMetadata)
+    assert len(meta) == 5
+    assert meta.ids.tolist() == [3, 5, 7, 12, 20]
+    for r in records:
+        assert meta[r["book_id"]] == r
+        assert r["book_id"] in meta
+    assert isinstance(meta[7]["num_pages"], int)
+    assert meta[20]["num_pages"] == ""                  # missing number
+    np.testing.assert_allclose(meta.column("average_rating"), [0.3, 0.5, 0.7, 1.2, 2.0])
+
+
+def test_missing_ids(tmp_path):
+    path = str(tmp_path / "meta")
+    write_columnar(path, [record(i) for i in (2, 4, 6)], COLUMNS)
+    meta = ColumnarMetadata(path)
+
+    for missing in (0, 3, 7, -1):
+        assert missing not in meta
+        assert meta.get(missing) is None
+        with pytest.raises(KeyError):
+            meta[missing]
+    assert meta.rows_of([4, 5, 6, 100, 2]).tolist() == [1, -1, 2, -1, 0]
+
+    empty = str(tmp_path / "empty")
+    write_columnar(empty, [], COLUMNS)
+    assert len(ColumnarMetadata(empty)) == 0
+    assert ColumnarMetadata(empty).rows_of([1]).tolist() == [-1]
+
+
+def test_resume_after_interrupted_write(tmp_path):
+    path = str(tmp_path / "meta")
+    writer = ColumnarWriter(path, COLUMNS)
+    writer.append([record(i) for i in range(6)])
+    writer.flush()
+    writer.append([record(i) for i in range(6, 9)])     # not checkpointed
+    writer.flush()
+    for handle in writer._handles():                    # crash: no schema written
+        handle.close()
+
+    writer = ColumnarWriter(path, COLUMNS, resume_rows=6)
+    with pytest.raises(ValueError):
+        writer.append([record(5)])                      # ids must keep ascending
+    writer.append([record(i) for i in range(6, 10)])
+    writer.close()
+
+    meta = ColumnarMetadata(path)
+    assert meta.ids.tolist() == list(range(10))
+    assert [meta[i] for i in range(10)] == [record(i) for i in range(10)]
+
+
+def test_overlay_adds_and_removes(tmp_path):
+    path = str(tmp_path / "meta")
+    write_columnar(path, [record(i) for i in (1, 2, 3)], COLUMNS)
+    base = ColumnarMetadata(path)
+
+    view = MetadataOverlay(base).add([record(9)]).remove([2, 9, 10])
+    view = view.add([record(11)])
+    assert 2 not in view and 9 not in view and view.get(2) is None
+    assert view[11] == record(11) and view[3] == record(3)
+    assert sorted(book_id for book_id, _ in view.items()) == [1, 3, 11]
+    assert 2 in base                                    # base untouched
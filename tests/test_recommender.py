@@ -0,0 +1,113 @@
+import os
+import time
+import hashlib
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+pytest.importorskip("requests")
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")     # config refuses to import without one
+
+import recommender
+from catalog import Catalog
+from indexing import build_index
+from metastore import write_columnar, ColumnarMetadata
+from embedding_cache import book_text
+
+DIM = 32
+COLUMNS = ["book_id", "isbn13", "title", "authors", "description", "thumbnail",
+           "average_rating", "ratings_count", "language"]
+
+
+class StubEncoder:
+    """Deterministic unit vectors per normalised text; no model download."""
+    cache_id = "stub"
+    dim = DIM
+
+    def encode(self, texts, **kwargs):
+        vecs = []
+        for text in texts:
+            seed = int(hashlib.sha1(" ".join(text.lower().split()).encode()).hexdigest()[:8], 16)
+            v = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+            vecs.append(v / np.linalg.norm(v))
+        return np.array(vecs, dtype=np.float32).reshape(-1, DIM)
+
+
+def books(n=60):
+    return [{
+        "book_id":        i * 3 + 1,        # sparse ids, like a catalog with removals
+        "isbn13":         str(9780000000000 + i),
+        "title":          f"Book {i}",
+        "authors":        f"Author {i % 7}",
+        "description":    f"a story about topic {i % 11}",
+        "thumbnail":      "",
+        "average_rating": float(i % 5),
+        "ratings_count":  i,
+        "language":       "en" if i % 3 else "de",
+    } for i in range(n)]
+
+
+@pytest.fixture
+def reco(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)           # response cache file
+    monkeypatch.setattr(recommender, "get_encoder", lambda *a, **k: StubEncoder())
+    return recommender.BookRecommender(catalog=Catalog())
+
+
+@pytest.fixture(params=["dict", "columnar"])
+def catalog_metadata(request, tmp_path):
+    records = books()
+    if request.param == "dict":
+        return records, {b["book_id"]: b for b in records}
+    path = str(tmp_path / "metadata")
+    write_columnar(path, records, COLUMNS)
+    return records, ColumnarMetadata(path)
+
+
+PROMPTS = ["topic 3", "a story about topic 7", "Book 12. a story about topic 1",
+           "9780000000005", '"author 4"', "topic 3"]
+
+
+@pytest.mark.parametrize("language,min_rating", [("Any", 0), ("English", 3), ("German", 2)])
+def test_recommend_many_matches_recommend(reco, catalog_metadata, language, min_rating):
+    records, metadata = catalog_metadata
+    ids = np.array([b["book_id"] for b in records], dtype=np.int64)
+    embs = StubEncoder().encode([book_text(b) for b in records])
+    reco.catalog.publish(build_index(DIM, embs, ids), metadata)
+
+    many = reco.recommend_many(PROMPTS, language, 4, 0, min_rating, "Local Only", "Rating")
+    assert len(many) == len(PROMPTS)
+    for prompt, (locals_, externals) in zip(PROMPTS, many):
+        one, _ = reco.recommend(prompt, language, 4, 0, min_rating, "Local Only", "Rating")
+        assert [b["book_id"] for b in locals_] == [b["book_id"] for b in one], prompt
+        assert [b["similarity"] for b in locals_] == pytest.approx(
+            [b["similarity"] for b in one], abs=1e-5)
+        assert externals == []
+
+
+class SlowEncoder(StubEncoder):
+    def encode(self, texts, **kwargs):
+        time.sleep(0.3)                 # first model load / busy encoder
+        return super().encode(texts, **kwargs)
+
+
+def test_slow_embed_does_not_time_out_local_only(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(recommender, "get_encoder", lambda *a, **k: SlowEncoder())
+    monkeypatch.setattr(recommender, "LOCAL_TIMEOUT", 0.1)
+    reco = recommender.BookRecommender(catalog=Catalog())
+    records = books()
+    ids = np.array([b["book_id"] for b in records], dtype=np.int64)
+    embs = StubEncoder().encode([book_text(b) for b in records])
+    reco.catalog.publish(build_index(DIM, embs, ids), {b["book_id"]: b for b in records})
+
+    locals_, _ = reco.recommend("topic 3", "Any", 4, 0, 0, "Local Only", "Rating")
+    assert len(locals_) == 4
+
+
+def test_cache_metrics_registered_once(reco, tmp_path):
+    recommender.BookRecommender(catalog=Catalog())
+    lines = recommender.metrics.REGISTRY.render().splitlines()
+    assert sum(line.startswith('library_query_cache{stat="hits"}') for line in lines) == 1
+    assert lines.count("# TYPE library_query_cache gauge") == 1
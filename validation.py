@@ -0,0 +1,87 @@
+# validation.py
+
+"""
+Book record validation shared by the Add Book form and bulk import:
+- Same rules and messages as the original add_book_ui checks
+- Accepts form values (lists, floats from gr.Number) or raw CSV/JSONL strings
+- Returns the cleaned details dict ready for DynamicBookManager
+"""
+
+FIELDS = ["isbn13", "isbn10", "title", "subtitle", "authors", "categories",
+          "thumbnail", "description", "published_year", "average_rating",
+          "num_pages", "ratings_count"]
+
+
+def _text(value) -> str:
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _as_int(value) -> int:
+    f = float(value)
+    if not f.is_integer():
+        raise ValueError()
+    return int(f)
+
+
+def _categories(value) -> list:
+    if isinstance(value, (list, tuple)):
+        return [c.strip() for c in value if str(c).strip()]
+    return [c.strip() for c in _text(value).split(",") if c.strip()]
+
+
+def validate_book(raw: dict):
+    """Return (details, None) for a valid record or (None, error message)."""
+    isbn13, isbn10 = _text(raw.get("isbn13")), _text(raw.get("isbn10"))
+    title = _text(raw.get("title"))
+    categories = _categories(raw.get("categories"))
+    if not (isbn13.isdigit() and len(isbn13) == 13):
+        return None, "❌ ISBN13 must be exactly 13 digits."
+    if not (isbn10.isdigit() and len(isbn10) == 10):
+        return None, "❌ ISBN10 must be exactly 10 digits."
+    if not title:
+        return None, "❌ Title cannot be empty."
+    if not categories:
+        return None, "❌ Please select at least one category."
+    try:
+        y = _as_int(raw.get("published_year"))
+        if y < 1000 or y > 9999:
+            raise ValueError()
+    except (TypeError, ValueError):
+        return None, "❌ Published Year must be a four-digit year."
+    try:
+        r = float(raw.get("average_rating"))
+        if not 0 <= r <= 5:
+            raise ValueError()
+    except (TypeError, ValueError):
+        return None, "❌ Average Rating must be between 0 and 5."
+    try:
+        p = _as_int(raw.get("num_pages"))
+        if p < 1:
+            raise ValueError()
+    except (TypeError, ValueError):
+        return None, "❌ Num Pages must be a positive integer."
+    try:
+        rc = _as_int(raw.get("ratings_count"))
+        if rc < 0:
+            raise ValueError()
+    except (TypeError, ValueError):
+        return None, "❌ Ratings Count must be a non-negative integer."
+
+    return {
+        "isbn13": isbn13,
+        "isbn10": isbn10,
+        "title": title,
+        "subtitle": _text(raw.get("subtitle")),
+        "authors": _text(raw.get("authors")),
+        "categories": ",".join(categories),
+        "thumbnail": _text(raw.get("thumbnail")),
+        "description": _text(raw.get("description")),
+        "published_year": y,
+        "average_rating": r,
+        "num_pages": p,
+        "ratings_count": rc
+    }, None
@@ -0,0 +1,83 @@
+# warmup.py
+
+"""
+Background start-up for the Gradio apps:
+- The apps build and serve their page straight away; the heavy imports
+  (torch, faiss, pandas), the catalog load and the first model forward pass
+  happen on a warmup thread
+- Engine.ready is the readiness signal; Engine.status() feeds the page's
+  status line
+- Handlers call Engine.get(), which blocks until the engine is warm, so
+  requests that arrive early wait in Gradio's queue instead of failing
+"""
+
+import time
+import logging
+import threading
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def build_library(stage):
+    """The apps' engine: (DynamicBookManager, BookRecommender), model loaded."""
+    stage("loading libraries")
+    from manager import DynamicBookManager
+    from recommender import BookRecommender
+    stage("loading catalog")
+    manager = DynamicBookManager()
+    reco = BookRecommender(catalog=manager.catalog)
+    stage("loading embedding model")
+    reco.embed(["warmup"])      # first forward pass is the slow one
+    return manager, reco
+
+
+class Engine:
+    """Runs `build_fn(stage_fn)` on a daemon thread and hands out its result."""
+
+    def __init__(self, build_fn, name: str = "engine-warmup"):
+        self.ready         = threading.Event()
+        self.stage         = "starting"
+        self.value         = None
+        self.error         = None
+        self.ready_seconds = None
+        self._build        = build_fn
+        self._started      = None
+        self._thread       = threading.Thread(target=self._run, daemon=True, name=name)
+
+    def start(self) -> "Engine":
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _set_stage(self, stage: str):
+        logger.info("Warmup: %s", stage)
+        self.stage = stage
+
+    def _run(self):
+        try:
+            self.value = self._build(self._set_stage)
+            self.ready_seconds = time.perf_counter() - self._started
+            metrics.record_request("warmup", self.ready_seconds)
+            logger.info("Engine ready in %.1fs", self.ready_seconds)
+        except Exception as e:
+            logger.exception("Engine warmup failed")
+            self.error = e
+        finally:
+            self.ready.set()
+
+    def get(self, timeout: float = None):
+        """Block until warm and return the built value; raises TimeoutError
+        if still warming after `timeout`, RuntimeError if the build failed."""
+        if not self.ready.wait(timeout):
+            raise TimeoutError(f"Engine still warming up ({self.stage})")
+        if self.error is not None:
+            raise RuntimeError(f"Engine failed to start: {self.error}") from self.error
+        return self.value
+
+    def status(self) -> str:
+        if self.error is not None:
+            return f"❌ Search engine failed to start: {self.error}"
+        if self.ready.is_set():
+            return f"✅ Ready (warmed up in {self.ready_seconds:.1f}s)"
+        return f"⏳ Warming up: {self.stage}…"